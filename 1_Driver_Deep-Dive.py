@@ -1,17 +1,27 @@
 import streamlit as st
-from PIL import Image
 import os
-from config import CIRCUIT_IMAGE_MAP, DRIVERS_2024, TEAMS_2024, CIRCUITS_2024 , SESSION_TYPES, LOCATION_TO_EVENT_NAME_MAP
-from narrative_generator import generate_narr, generate_nerd_stats
-from telemetry import load_session_data, get_driver_laps, get_driver_telemetry
-from plotting import generate_telemetry_plots, generate_strategy_plot
-import base64
-import pandas as pd
-import fastf1 as ff
-import joblib
-import re
-import xgboost as xgb
-import google.generativeai as genai
+from instrumentation import span, start_rerun, finish_rerun, start_metrics_server, render_debug_panel, import_module
+
+# Every rerun is traced; ?debug=1 shows the timings, F1_METRICS_LOG / F1_METRICS_PORT export them
+trace = start_rerun("driver_deep_dive")
+
+# FastF1, joblib, the live feed and the Gemini client are imported where they are first used
+with span("imports"):
+    from config import DRIVERS_2024, TEAMS_2024, CIRCUITS_2024 , SESSION_TYPES, LOCATION_TO_EVENT_NAME_MAP, TELEMETRY_MAX_POINTS
+    from narrative_generator import generate_narr, generate_nerd_stats
+    from telemetry import load_session_data, load_laps_telemetry, get_lap_cache
+    from session_summary import load_session_summary, get_driver_summary, get_driver_stints
+    from season_index import get_circuits_for_year, get_session_types, get_drivers_for_event
+    from plotting import generate_telemetry_figure, figure_payload_bytes, generate_strategy_plot, generate_prediction_heatmap, generate_degradation_curve, generate_comparison_figure, generate_minisector_map, generate_field_degradation_chart
+    from comparison import compare_laps, mini_sector_table
+    from degradation import load_stint_degradation, compound_degradation, tyre_life_check
+    from session_store import record_view
+    from cache_backend import get_cache
+    from model_registry import get_model_registry
+    from asset_cache import get_asset_cache
+    from weather_features import get_weather_cache
+    from predictor import COMPOUNDS, WEATHER_SCENARIOS, load_circuit_model, build_scenario_point, build_scenario_grid, predict_grid, format_lap_time
+    import pandas as pd
 
 if 'prediction_made' not in st.session_state:
     st.session_state.prediction_made = False
@@ -22,27 +32,25 @@ if 'prediction_result' not in st.session_state:
 if 'ai_report' not in st.session_state:
     st.session_state.ai_report = None
 
+if 'sweep_result' not in st.session_state:
+    st.session_state.sweep_result = None
+
+if 'comparison' not in st.session_state:
+    st.session_state.comparison = None
+
 if 'analysis_run' not in st.session_state:
     st.session_state.analysis_run = False
 
+start_metrics_server()
+assets = get_asset_cache()
+show_debug_panel = st.query_params.get("debug") == "1"
+
 def reset_analysis():
     st.session_state.analysis_run = False
+    st.session_state.sweep_result = None
+    st.session_state.comparison = None
 
 
-def get_circuits_for_year(year):
-    schedule = ff.get_event_schedule(year)
-    circuits = schedule['Location'].unique().tolist()
-    return circuits
-
-@st.cache_data(show_spinner=False)
-def get_drivers_for_year(year):
-    session = ff.get_session(year, 1, 'R') 
-    session.load(telemetry=False, laps=False, weather=False)
-    results = session.results
-
-    driver_dict = dict(zip(results['Abbreviation'], results['FullName']))
-    return driver_dict
-
 # ----------- APP SETTINGS -----------
 st.set_page_config(page_title="F1 Dashboard", layout="wide")
 st.markdown("""
@@ -80,13 +88,9 @@ st.markdown("""
 # ----------- TOP BAR: LOGO + TITLE -----------
 col_logo, col_title, col_spacer = st.columns([1, 6, 1])
 with col_logo:
-    logo_path = "assets/F1_logo.png"
-    if os.path.exists(logo_path):
-        logo_base64 = base64.b64encode(open(logo_path, "rb").read()).decode()
-        st.markdown(
-            f'<img src="data:image/png;base64,{logo_base64}" width="100" style="box-shadow: none; border-radius: 0;">',
-            unsafe_allow_html=True
-        )
+    logo = assets.logo()
+    if logo is not None:
+        st.markdown(logo.img_tag(100), unsafe_allow_html=True)
 
 st.markdown("<hr style='border: 1px solid #FF1801;'>", unsafe_allow_html=True)
 
@@ -95,12 +99,16 @@ st.markdown("<hr style='border: 1px solid #FF1801;'>", unsafe_allow_html=True)
 st.sidebar.header("Select Race Details")
 year_list = [2024, 2023, 2022, 2021, 2020, 2019, 2018]
 year = st.sidebar.selectbox("Select Year", year_list, on_change=reset_analysis)
-available_circuits = get_circuits_for_year(year)
+with span("schedule"):
+    available_circuits = get_circuits_for_year(year)
 circuit = st.sidebar.selectbox("Select Circuit", available_circuits, on_change=reset_analysis)
 
-session_type = st.sidebar.selectbox("Select Session Type", SESSION_TYPES)
+with span("schedule"):
+    session_types = get_session_types(year, circuit)
+session_type = st.sidebar.selectbox("Select Session Type", session_types)
 
-available_drivers = get_drivers_for_year(year)
+with span("schedule"):
+    available_drivers = get_drivers_for_event(year, circuit)
 driver_keys = list(available_drivers.keys())
 
 selected_driver_code = st.sidebar.selectbox(
@@ -112,6 +120,19 @@ selected_driver_code = st.sidebar.selectbox(
 
 if st.sidebar.button("Show Analysis"):
     st.session_state.analysis_run = True
+    record_view(year, circuit, session_type)
+
+# Live mode only exists when the server is given a feed directory, and only its files can be followed
+live_feed, replay_speed = None, 0
+if os.environ.get("F1_LIVE_FEED_DIR"):
+    st.sidebar.header("Live Session")
+    live_feed = st.sidebar.selectbox("Live Feed", [None] + import_module("live_session").list_live_feeds(),
+                                     format_func=lambda name: name or "Off",
+                                     help="JSONL feed written by a live recorder, or a replay made with live_session.py")
+    replay_speed = st.sidebar.number_input("Replay Speed", min_value=0, value=0,
+                                           help="0 follows the file as it is written; above 0 replays a recording at that multiple of real time")
+    if live_feed:
+        st.sidebar.button("Refresh Live Data")
 
 
 st.sidebar.header("Gemini API Key")
@@ -137,6 +158,7 @@ if submitted:
         st.sidebar.warning("Please enter a key.")
     else:
         try:
+            genai = import_module("google.generativeai")
             genai.configure(api_key=key_to_validate)
             list(genai.list_models())
             
@@ -149,35 +171,52 @@ if submitted:
             st.session_state.gemini_api_key = None
 
 if st.session_state.analysis_run:
-    all_laps, results, total_laps, weather_data = load_session_data(year, circuit, session_type)
-    driver_laps = get_driver_laps(all_laps, selected_driver_code)
-    driver_telemetry = get_driver_telemetry(all_laps, selected_driver_code)
+    trace.tags.update(year=year, circuit=circuit, session=session_type, driver=selected_driver_code,
+                      live=bool(live_feed))
+    live = import_module("live_session").get_live_session(live_feed, replay_speed) if live_feed else None
+    with span("session_load"):
+        if live is not None:
+            # Only laps that arrived or changed since the last rerun are recomputed
+            live_update = live.refresh()
+            if live_update.malformed:
+                st.error(f"Skipped {live_update.malformed} malformed lines in {live_feed}: {live.feed.last_error}")
+            all_laps, results, total_laps, weather_data = live.session_data()
+            if all_laps.empty:
+                st.error(f"No laps in {live_feed} yet")
+                st.stop()
+            session_summary, session_stints, stint_fits = live.summary, live.stints, live.degradation
+            st.caption(f"🔴 Live: {len(all_laps):,} laps, {live_update.new_laps} new this refresh, "
+                       f"{len(live_update.changed_drivers)} drivers updated in {live_update.seconds * 1000:.0f} ms")
+        else:
+            all_laps, results, total_laps, weather_data = load_session_data(year, circuit, session_type)
+            session_summary, session_stints = load_session_summary(year, circuit, session_type)
+            stint_fits = load_stint_degradation(year, circuit, session_type)
+        driver_summary = get_driver_summary(session_summary, selected_driver_code)
 
-    driver_img_path = f"assets/drivers/{selected_driver_code}.png"
-    image_filename = CIRCUIT_IMAGE_MAP.get(circuit, "default.png")
-    circuit_img_path = f"assets/circuits/{image_filename}"
+    driver_img = assets.driver(selected_driver_code)
+    circuit_img = assets.circuit(circuit)
     
     col1, col3 = st.columns([2, 2])
     with col1:
-        st.image(driver_img_path, caption=DRIVERS_2024[selected_driver_code], use_container_width=False, width=280)
+        if driver_img is not None:
+            st.image(driver_img.data, caption=DRIVERS_2024[selected_driver_code], use_container_width=False, width=280)
     with col3:
-        st.image(circuit_img_path, caption=circuit, use_container_width=False, width=500)
+        if circuit_img is not None:
+            st.image(circuit_img.data, caption=circuit, use_container_width=False, width=500)
 
     tab1, tab2 = st.tabs(["## Full Race Analysis", "## ML Pace Predictor"])
 
     with tab1:
-        driver_result_row = results.loc[results['Abbreviation'] == selected_driver_code]
-        if not driver_result_row.empty:
-            driver_result = driver_result_row.iloc[0]
-            position = driver_result['Position']
-            status = driver_result['Status']
+        if driver_summary.has_result:
+            position = driver_summary.position
+            status = driver_summary.status
             position_text = f"P{int(position)}" if pd.notnull(position) else "N/A"
         else:
             position_text = "N/A"
             status = "Did not participate"
 
-        if not driver_laps.empty:
-            fastest_lap_time = driver_laps['LapTime'].min()
+        if driver_summary.has_laps:
+            fastest_lap_time = driver_summary.fastest_lap_time
             fastest_lap_text = str(fastest_lap_time).split(':', 1)[1] if pd.notnull(fastest_lap_time) else "N/A"
         else:
             fastest_lap_text = "N/A"
@@ -190,22 +229,21 @@ if st.session_state.analysis_run:
         with metric_col3:
             st.metric(label="Status", value=status)
         with metric_col4:
-            if not driver_laps.empty:
-                team_name = driver_laps['Team'].iloc[0]
-                team_logo_path = f"assets/teams/{team_name}.png"
+            if driver_summary.has_laps:
+                team_name = driver_summary.team
+                team_logo = assets.team(team_name)
                 
-                if os.path.exists(team_logo_path):
-                    team_logo_base64 = base64.b64encode(open(team_logo_path, "rb").read()).decode()
-                    st.markdown(
-                        f'<img src="data:image/png;base64,{team_logo_base64}" width="100" style="box-shadow: none; border-radius: 0;">',
-                        unsafe_allow_html=True
-                    )
+                if team_logo is not None:
+                    st.markdown(team_logo.img_tag(100), unsafe_allow_html=True)
                 else:
                     st.metric(team_name)
                 
         st.markdown("---")
-        narr, sector = generate_narr(driver_laps, selected_driver_code, circuit, session_type)
-        stats = generate_nerd_stats(driver_laps, driver_telemetry, selected_driver_code, circuit, session_type)
+        with span("narrative"):
+            if live is not None:
+                narr, sector = live.narrative(driver_summary, circuit, session_type)
+            else:
+                narr, sector = generate_narr(driver_summary, circuit, session_type)
         
         cola, colb, colc = st.columns([1.5,1.5,1.5])
         with cola:
@@ -213,130 +251,130 @@ if st.session_state.analysis_run:
         with colb:
             st.markdown(sector, unsafe_allow_html = True)
         with colc:
+            # Telemetry aggregates need the session's car data, decoded only once the lap stats are on screen
+            with span("telemetry_summary"):
+                if live is not None:
+                    telemetry_summary = session_summary
+                else:
+                    telemetry_summary, _ = load_session_summary(year, circuit, session_type, telemetry=True)
+            with span("narrative"):
+                stats = generate_nerd_stats(get_driver_summary(telemetry_summary, selected_driver_code), circuit, session_type)
             st.markdown(stats, unsafe_allow_html = True)
 
         st.markdown("---")
         st.markdown("### Tyre Strategy ")
-        if not driver_laps.empty:
-            fig_strategy = generate_strategy_plot(driver_laps)
+        if driver_summary.has_laps:
+            with span("plot_strategy"):
+                fig_strategy = generate_strategy_plot(get_driver_stints(session_stints, selected_driver_code))
             if fig_strategy:
                 st.plotly_chart(fig_strategy, use_container_width=True)
 
+        st.markdown("---")
+        st.markdown("### Tyre Degradation")
+        with span("plot_degradation"):
+            fig_degradation = generate_field_degradation_chart(stint_fits, highlight=selected_driver_code)
+        if fig_degradation:
+            st.plotly_chart(fig_degradation, use_container_width=True)
+            st.dataframe(compound_degradation(stint_fits).round(3), hide_index=True, use_container_width=True)
+        else:
+            st.warning("Not enough clean stints in this session to fit tyre degradation")
+
         st.markdown("---")
         st.markdown("### Fastest Lap Telemetry Analysis")
 
-        if not driver_laps.empty:
-            fastest_lap = driver_laps.loc[driver_laps['LapTime'].idxmin()]
-            fastest_lap_telemetry = fastest_lap.get_telemetry().add_distance()
-            fig_speed, fig_throttle, fig_brake, fig_rpm, fig_gear=  generate_telemetry_plots(fastest_lap_telemetry)
-            if fig_speed:
-                st.plotly_chart(fig_speed,use_container_width = True)
-
-                col_t, col_b = st.columns(2)
-                with col_t:
-                    st.plotly_chart(fig_throttle,use_container_width = True)
-                with col_b:
-                    st.plotly_chart(fig_brake,use_container_width = True)
-                
-                col_r, col_g = st.columns(2)
-                with col_r:
-                    st.plotly_chart(fig_rpm,use_container_width = True)
-                with col_g:
-                    st.plotly_chart(fig_gear,use_container_width = True)
+        if driver_summary.fastest_lap_index is not None:
+            fastest_lap = all_laps.loc[[driver_summary.fastest_lap_index]]
+            with span("telemetry"):
+                if live is not None:
+                    fastest_lap_telemetry = live.lap_telemetry(selected_driver_code, fastest_lap, position=True)
+                else:
+                    fastest_lap_telemetry = load_laps_telemetry(year, circuit, session_type, selected_driver_code, fastest_lap, position=True)
+            with span("plot_telemetry"):
+                fig_telemetry = generate_telemetry_figure(fastest_lap_telemetry, max_points=TELEMETRY_MAX_POINTS)
+            if fig_telemetry:
+                st.plotly_chart(fig_telemetry, use_container_width = True)
+                st.caption(f"{len(fastest_lap_telemetry):,} samples, plotted with up to {TELEMETRY_MAX_POINTS:,} points per trace "
+                           f"({figure_payload_bytes(fig_telemetry) / 1024:.0f} KB)")
             else:
                 st.warning(f"Could not generate telemetry plots for the fastest lap")
         else:
             st.warning(f"No lap data available to find fastest lap")
+
+        st.markdown("---")
+        st.markdown("### Driver Comparison")
+        col_drivers, col_laps = st.columns([3, 1])
+        with col_drivers:
+            compare_drivers = st.multiselect("Drivers to Compare", driver_keys, default=[selected_driver_code],
+                                             format_func=lambda x: available_drivers[x])
+        with col_laps:
+            lap_choice = st.radio("Laps", ["Fastest Laps", "Lap Number"], horizontal=True)
+            compare_lap = st.number_input("Lap", min_value=1, max_value=int(total_laps), value=1,
+                                          disabled=lap_choice == "Fastest Laps")
+        if st.button("Compare Laps") and compare_drivers:
+            lap_numbers = None if lap_choice == "Fastest Laps" else [compare_lap]
+            with span("telemetry_comparison"):
+                if live is not None:
+                    st.session_state.comparison = live.compare_laps(compare_drivers, lap_numbers, position=True)
+                else:
+                    st.session_state.comparison = compare_laps(year, circuit, session_type, all_laps, compare_drivers,
+                                                               lap_numbers, position=True)
+
+        comparison = st.session_state.get('comparison')
+        if comparison is not None:
+            with span("plot_comparison"):
+                fig_comparison = generate_comparison_figure(comparison, max_points=TELEMETRY_MAX_POINTS)
+            if fig_comparison:
+                st.plotly_chart(fig_comparison, use_container_width=True)
+                col_map, col_table = st.columns([3, 2])
+                with col_map, span("plot_comparison"):
+                    fig_map = generate_minisector_map(comparison)
+                    if fig_map:
+                        st.plotly_chart(fig_map, use_container_width=True)
+                with col_table:
+                    st.dataframe(mini_sector_table(comparison).round(3), hide_index=True, use_container_width=True)
+            else:
+                st.warning("No telemetry available for the selected laps")
     
     with tab2:
         st.markdown("## Lap Time Predictor")
         col_a, col_b = st.columns(2)
         with col_a:
             lap_number = st.slider('Select Lap Number', min_value = 2, max_value = int(total_laps), value = 2)
-            compound = st.selectbox('Select Tyre Compound', ['HYPERSOFT','SUPERSOFT','ULTRASOFT','SOFT','MEDIUM','INTERMEDIATE','HARD','WET'])
+            compound = st.selectbox('Select Tyre Compound', COMPOUNDS)
         with col_b:
             tyre_life = st.slider('Select Tyre Age (Laps)', min_value = 1, max_value = int(total_laps), value = 2)
             stint = st.number_input("Select Stint Number", min_value=1, max_value=5, value=2)
             
-        weather = st.selectbox("Select Weather Scenario", ["Use Historical Average", "Simulate: Sunny & Hot", "Simulate: Cloudy & Cool", "Simulate: Light Rain"])
+        weather = st.selectbox("Select Weather Scenario", WEATHER_SCENARIOS)
+        tyre_warning = tyre_life_check(stint_fits, compound, tyre_life)
+        if tyre_warning:
+            st.warning(tyre_warning)
         if st.button("Predict Lap Time"):
-            event_name = LOCATION_TO_EVENT_NAME_MAP.get(circuit,circuit)
-            safe_event_name = re.sub(r'[\\/*?:"<>|]', "", event_name).replace(" ", "_")
-            model_path = f"models/{safe_event_name}_model.joblib"
-            
             try:
-                model = joblib.load(model_path)
+                loaded_model = load_circuit_model(circuit)
             except FileNotFoundError:
                 st.error(f"Prediction model for {circuit} not found. Please ensure it has been trained.")
                 st.stop()
 
-            if isinstance(model, xgb.XGBRegressor):
-                model_features = model.get_booster().feature_names
+            with span("predict"):
+                scenario = build_scenario_point(lap_number, tyre_life, compound, weather)
+                prediction = predict_grid(loaded_model, scenario, weather_data, year, selected_driver_code, stint)
+            if prediction.empty:
+                st.warning("The model returned no prediction for this combination.")
             else:
-                model_features = model.feature_name_
-            
-            df = pd.DataFrame(0, index = [0],columns = model_features)
-            df['LapNumber'] = lap_number
-            df['Stint'] = stint
-            df['TyreLife'] = tyre_life
-            df['Year'] = year
-            if weather == "Use Historical Average":
-                df['AirTemp'] = weather_data['AirTemp'].mean()
-                df['Humidity'] = weather_data['Humidity'].mean()
-                df['Pressure'] = weather_data['Pressure'].mean()
-                df['Rainfall'] = weather_data['Rainfall'].mode()[0]
-                df['TrackTemp'] = weather_data['TrackTemp'].mean()
-                df['WindDirection'] = weather_data['WindDirection'].mean()
-                df['WindSpeed'] = weather_data['WindSpeed'].mean()
-            elif weather == "Simulate: Sunny & Hot":
-                df['AirTemp'] = weather_data['AirTemp'].mean() + 5
-                df['Humidity'] = weather_data['Humidity'].mean() - 5
-                df['Pressure'] = weather_data['Pressure'].mean() 
-                df['Rainfall'] = 0
-                df['TrackTemp'] = weather_data['TrackTemp'].mean() + 5
-                df['WindDirection'] = weather_data['WindDirection'].mean()
-                df['WindSpeed'] = weather_data['WindSpeed'].mean() - 2
-            elif weather == "Simulate: Cloudy & Cool":
-                df['AirTemp'] = weather_data['AirTemp'].mean() - 3
-                df['Humidity'] = weather_data['Humidity'].mean() + 10
-                df['Pressure'] = weather_data['Pressure'].mean() 
-                df['Rainfall'] = 0
-                df['TrackTemp'] = weather_data['TrackTemp'].mean() - 5
-                df['WindDirection'] = weather_data['WindDirection'].mean()
-                df['WindSpeed'] = weather_data['WindSpeed'].mean() * 1.5
-            elif weather == "Simulate: Light Rain":
-                df['AirTemp'] = weather_data['AirTemp'].mean() - 10
-                df['Humidity'] = 98.0
-                df['Pressure'] = weather_data['Pressure'].mean() 
-                df['Rainfall'] = 1
-                df['TrackTemp'] = weather_data['TrackTemp'].mean() - 15
-                df['WindDirection'] = weather_data['WindDirection'].mean()
-                df['WindSpeed'] = weather_data['WindSpeed'].mean() * 1.5
-            
-            driver = f"Driver_{selected_driver_code}"
-            if driver in df.columns:
-                df[driver] = 1
-
-            comp = f"Compound_{compound}"
-            if comp in df.columns:
-                df[comp] = 1
-            
-            pred_time_s = model.predict(df)[0]
-            mins = int(pred_time_s // 60)
-            sec = pred_time_s % 60
-            lap_time = f"{mins}:{sec:06.3f}"
-
-            st.session_state.prediction_made = True
-            st.session_state.prediction_result = {
-                "time_str": lap_time,
-                "driver_name": available_drivers[selected_driver_code],
-                "circuit": circuit,
-                "lap_number": lap_number,
-                "compound": compound,
-                "tyre_life": tyre_life,
-                "weather": weather
-            }
-            st.session_state.ai_report = None
+                lap_time = format_lap_time(prediction['PredictedLapTime'].iloc[0])
+
+                st.session_state.prediction_made = True
+                st.session_state.prediction_result = {
+                    "time_str": lap_time,
+                    "driver_name": available_drivers[selected_driver_code],
+                    "circuit": circuit,
+                    "lap_number": lap_number,
+                    "compound": compound,
+                    "tyre_life": tyre_life,
+                    "weather": weather
+                }
+                st.session_state.ai_report = None
 
         if st.session_state.prediction_made:
             st.markdown('<h3 style="color: #FF1801;">ML Model Prediction</h3>', unsafe_allow_html=True)
@@ -356,8 +394,10 @@ if st.session_state.analysis_run:
                                 f"The simulation predicts a lap time of **{result['time_str']}**.\n\n"
                                 f"**Your Commentary (in a few short, exciting paragraphs):**")
                         
-                        gemini_model = genai.GenerativeModel('models/gemini-2.5-flash')
-                        response = gemini_model.generate_content(prompt)
+                        with span("gemini"):
+                            genai = import_module("google.generativeai")
+                            gemini_model = genai.GenerativeModel('models/gemini-2.5-flash')
+                            response = gemini_model.generate_content(prompt)
                         st.session_state.ai_report = response.text
                 else:
                     st.error("Please enter and validate a Gemini API key in the sidebar first.")
@@ -366,8 +406,60 @@ if st.session_state.analysis_run:
                 st.markdown('<h3 style="color: #FF1801;">Google Gemini as an F1 TV Commentator</h3>', unsafe_allow_html=True)
                 st.markdown(f'<div class="ai-report">{st.session_state.ai_report}</div>', unsafe_allow_html=True)
 
-                
+        if live is not None:
+            st.markdown("---")
+            st.markdown('<h3 style="color: #FF1801;">Live Next-Lap Predictions</h3>', unsafe_allow_html=True)
+            try:
+                with span("predict"):
+                    next_laps = live.next_lap_predictions(load_circuit_model(circuit), year)
+            except FileNotFoundError:
+                st.error(f"Prediction model for {circuit} not found. Please ensure it has been trained.")
+                next_laps = None
+            if next_laps is not None and not next_laps.empty:
+                next_laps = next_laps.assign(Prediction=next_laps['PredictedLapTime'].map(format_lap_time))
+                st.dataframe(next_laps[['Driver', 'LapNumber', 'TyreLife', 'Compound', 'Prediction']],
+                             hide_index=True, use_container_width=True)
 
+        st.markdown("---")
+        st.markdown('<h3 style="color: #FF1801;">What-If Sweep</h3>', unsafe_allow_html=True)
+        sweep_compounds = st.multiselect("Compounds to Sweep", COMPOUNDS, default=[compound])
+        sweep_weather = st.multiselect("Weather Scenarios to Sweep", WEATHER_SCENARIOS, default=WEATHER_SCENARIOS)
+        if st.button("Run Sweep") and sweep_compounds and sweep_weather:
+            try:
+                loaded_model = load_circuit_model(circuit)
+            except FileNotFoundError:
+                st.error(f"Prediction model for {circuit} not found. Please ensure it has been trained.")
+                st.stop()
 
-                
-            
\ No newline at end of file
+            laps_range = range(1, int(total_laps) + 1)
+            with span("predict_sweep"):
+                grid = build_scenario_grid(laps_range, laps_range, sweep_compounds, sweep_weather)
+                st.session_state.sweep_result = predict_grid(loaded_model, grid, weather_data, year, selected_driver_code, stint)
+
+        sweep_result = st.session_state.get('sweep_result')
+        if sweep_result is not None and not sweep_result.empty:
+            st.caption(f"{len(sweep_result):,} scenarios predicted")
+            with span("plot_sweep"):
+                fig_curve = generate_degradation_curve(sweep_result, lap_number)
+            if fig_curve:
+                st.plotly_chart(fig_curve, use_container_width=True)
+
+            col_hc, col_hw = st.columns(2)
+            with col_hc:
+                heatmap_compound = st.selectbox("Heatmap Compound", sweep_result['Compound'].unique())
+            with col_hw:
+                heatmap_weather = st.selectbox("Heatmap Weather", sweep_result['Weather'].unique())
+            with span("plot_sweep"):
+                fig_heatmap = generate_prediction_heatmap(sweep_result, heatmap_compound, heatmap_weather)
+            if fig_heatmap:
+                st.plotly_chart(fig_heatmap, use_container_width=True)
+
+if show_debug_panel:
+    render_debug_panel(trace, {
+        'Tiered cache': get_cache().cache_info(),
+        'Lap telemetry cache': get_lap_cache().cache_info(),
+        'Model registry': get_model_registry().cache_info(),
+        'Weather indexes': get_weather_cache().cache_info(),
+        'Assets': assets.cache_info()
+    })
+finish_rerun(trace)
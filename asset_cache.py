@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import time
+from dataclasses import dataclass
+import streamlit as st
+from config import ASSET_WIDTHS, CIRCUIT_IMAGE_MAP
+
+ASSETS_DIR = "assets"
+LOGO_FILE = "F1_logo.png"
+BUILD_DIR = "build"  # resized variants and their manifest, written by converter.py
+MANIFEST_FILE = "manifest.json"
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp', '.avif', '.svg')
+INLINE_GROUPS = ('logo', 'teams')  # rendered as inline <img> tags, so their base64 form is built up front
+
+
+@dataclass(frozen=True)
+class Asset:
+    path: str
+    mime: str
+    data: bytes
+    data_uri: str = None
+
+    def img_tag(self, width):
+        uri = self.data_uri or f"data:{self.mime};base64,{base64.b64encode(self.data).decode()}"
+        return f'<img src="{uri}" width="{width}" style="box-shadow: none; border-radius: 0;">'
+
+
+def asset_group(relative):
+    # Images outside the groups in ASSET_WIDTHS (e.g. the README screenshot) are not preloaded
+    return 'logo' if relative == LOGO_FILE else os.path.dirname(relative)
+
+
+class AssetCache:
+    # Every image the page shows, read once per process at the size it is shown;
+    # pages get bytes or a ready data URI, never a file read
+    def __init__(self, root=ASSETS_DIR):
+        self.root = root
+        self.manifest = self._load_manifest()
+        self._assets = {}
+        self._verified = {}
+        self.load_seconds = 0.0
+
+    def _load_manifest(self):
+        path = os.path.join(self.root, BUILD_DIR, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get('assets', {})
+
+    def preload(self):
+        start = time.perf_counter()
+        for directory, dirs, names in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d != BUILD_DIR and not d.endswith("_avif")]
+            for name in names:
+                relative = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                if name.lower().endswith(IMAGE_SUFFIXES) and asset_group(relative) in ASSET_WIDTHS:
+                    self.get(relative, ASSET_WIDTHS[asset_group(relative)])
+        self.load_seconds = time.perf_counter() - start
+        return self
+
+    def _is_built(self, relative, entry):
+        # A variant is only served while its source still has the hash it was built from
+        if relative not in self._verified:
+            source = os.path.join(self.root, entry['source'])
+            if not os.path.exists(source):
+                self._verified[relative] = False
+            else:
+                with open(source, "rb") as f:
+                    self._verified[relative] = hashlib.sha256(f.read()).hexdigest() == entry['sha256']
+        return self._verified[relative]
+
+    def resolve(self, relative, width=None):
+        # Smallest built file at least as wide as it is shown, else the original
+        entry = self.manifest.get(relative)
+        if entry is None or width is None or not self._is_built(relative, entry):
+            return os.path.join(self.root, relative)
+        target = min(width, entry['width'])
+        fitting = [v for v in entry['variants']
+                   if v['width'] >= target and os.path.exists(os.path.join(self.root, v['path']))]
+        if not fitting:
+            return os.path.join(self.root, relative)
+        return os.path.join(self.root, min(fitting, key=lambda v: v['bytes'])['path'])
+
+    def _load(self, relative, width):
+        path = self.resolve(relative, width)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        data_uri = None
+        if asset_group(relative) in INLINE_GROUPS:
+            data_uri = f"data:{mime};base64,{base64.b64encode(data).decode()}"
+        asset = self._assets[(relative, width)] = Asset(path, mime, data, data_uri)
+        return asset
+
+    def get(self, relative, width=None):
+        # Files added after startup are picked up on first request
+        asset = self._assets.get((relative, width))
+        return asset if asset is not None else self._load(relative, width)
+
+    def logo(self, width=ASSET_WIDTHS['logo']):
+        return self.get(LOGO_FILE, width)
+
+    def circuit(self, circuit, width=ASSET_WIDTHS['circuits']):
+        return self.get(f"circuits/{CIRCUIT_IMAGE_MAP.get(circuit, 'default.png')}", width)
+
+    def driver(self, driver_code, width=ASSET_WIDTHS['drivers']):
+        return self.get(f"drivers/{driver_code}.png", width)
+
+    def team(self, team_name, width=ASSET_WIDTHS['teams']):
+        return self.get(f"teams/{team_name}.png", width)
+
+    def cache_info(self):
+        assets = list(self._assets.values())
+        return {'assets': len(assets), 'bytes': sum(len(a.data) for a in assets),
+                'inline_bytes': sum(len(a.data_uri or "") for a in assets),
+                'built_variants': sum(BUILD_DIR in a.path.split(os.sep) for a in assets),
+                'load_seconds': round(self.load_seconds, 4)}
+
+
+@st.cache_resource(show_spinner=False)
+def get_asset_cache():
+    return AssetCache().preload()
@@ -0,0 +1,313 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import plotly.graph_objects as go
+import session_store
+from comparison import compare_laps
+from degradation import fit_stint_degradation
+from live_session import LiveSession, ReplayFeed, record_replay
+from session_summary import build_session_summary, get_driver_stints, get_driver_summary, summarize_driver
+from benchmarks.fixture import FIXTURE_DRIVERS, FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, make_fixture_session
+from narrative_generator import generate_narr, generate_nerd_stats
+from plotting import figure_payload_bytes, generate_comparison_figure, generate_field_degradation_chart, \
+    generate_strategy_plot, generate_telemetry_figure
+from predictor import COMPOUNDS, WEATHER_SCENARIOS, build_scenario_grid, build_scenario_point, load_circuit_model, \
+    predict_grid
+from telemetry import get_driver_laps, get_driver_telemetry, get_lap_cache, load_driver_car_data, \
+    load_laps_telemetry, load_session_data
+
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+DRIVER = 'HAM'
+MODEL_CIRCUIT = 'Monza'
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BASELINE_FILE = os.path.join(RESULTS_DIR, "baseline.json")
+NOISE_FLOOR_SECONDS = 0.002
+# What 1_Driver_Deep-Dive.py imports before its first render
+PAGE_MODULES = ['config', 'instrumentation', 'narrative_generator', 'telemetry', 'session_summary', 'season_index',
+                'plotting', 'comparison', 'degradation', 'session_store', 'cache_backend', 'model_registry',
+                'asset_cache', 'weather_features', 'predictor', 'pandas']
+
+
+def uncached(func):
+    # Benchmarks measure the work itself, not Streamlit's in-process cache
+    return getattr(func, '__wrapped__', func)
+
+def payload_bytes(output):
+    if output is None:
+        return 0
+    if isinstance(output, (tuple, list)):
+        return sum(payload_bytes(item) for item in output)
+    if isinstance(output, go.Figure):
+        return figure_payload_bytes(output)
+    if isinstance(output, (pd.DataFrame, pd.Series)):
+        return int(output.memory_usage(deep=True).sum()) if isinstance(output, pd.DataFrame) \
+            else int(output.memory_usage(deep=True))
+    if isinstance(output, str):
+        return len(output.encode('utf-8'))
+    if hasattr(output, 'nbytes'):
+        return int(output.nbytes)
+    return sys.getsizeof(output)
+
+
+# ----------- STAGES -----------
+def stage_load_session(ctx):
+    ctx['laps'], ctx['results'], ctx['total_laps'], ctx['weather'] = \
+        uncached(load_session_data)(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION)
+    return ctx['laps'], ctx['results'], ctx['weather']
+
+def stage_driver_laps(ctx):
+    ctx['driver_laps'] = get_driver_laps(ctx['laps'], DRIVER)
+    return ctx['driver_laps']
+
+def stage_driver_car_data(ctx):
+    ctx['car_data'] = load_driver_car_data(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, DRIVER)
+    return ctx['car_data']
+
+def stage_driver_telemetry(ctx):
+    ctx['telemetry'] = get_driver_telemetry(ctx['laps'], DRIVER, ctx['car_data'])
+    return ctx['telemetry']
+
+def stage_fastest_lap_telemetry(ctx):
+    driver_laps = ctx['driver_laps']
+    ctx['fastest_lap'] = driver_laps.loc[[driver_laps['LapTime'].idxmin()]]
+    get_lap_cache().clear()  # cold path: read, extract and merge
+    ctx['fastest_lap_telemetry'] = load_laps_telemetry(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, DRIVER,
+                                                       ctx['fastest_lap'], position=True)
+    return ctx['fastest_lap_telemetry']
+
+def stage_cached_lap_telemetry(ctx):
+    return load_laps_telemetry(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, DRIVER, ctx['fastest_lap'], position=True)
+
+def stage_driver_summary(ctx):
+    ctx['summary'] = summarize_driver(ctx['driver_laps'], ctx['telemetry'], DRIVER)
+    return ctx['summary']
+
+def stage_session_summary(ctx):
+    ctx['session_summary'], ctx['stints'] = build_session_summary(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION)
+    return ctx['session_summary'], ctx['stints']
+
+def stage_summary_lookup(ctx):
+    return get_driver_summary(ctx['session_summary'], DRIVER)
+
+def stage_stints_lookup(ctx):
+    return get_driver_stints(ctx['stints'], DRIVER)
+
+def stage_narrative(ctx):
+    return generate_narr(ctx['summary'], FIXTURE_CIRCUIT, FIXTURE_SESSION)
+
+def stage_nerd_stats(ctx):
+    return generate_nerd_stats(ctx['summary'], FIXTURE_CIRCUIT, FIXTURE_SESSION)
+
+def stage_strategy_plot(ctx):
+    return generate_strategy_plot(get_driver_stints(ctx['stints'], DRIVER))
+
+def stage_stint_degradation(ctx):
+    ctx['stint_fits'] = fit_stint_degradation(ctx['laps'], ctx['total_laps'])
+    return ctx['stint_fits']
+
+def stage_degradation_plot(ctx):
+    return generate_field_degradation_chart(ctx['stint_fits'], highlight=DRIVER)
+
+def stage_telemetry_plot(ctx):
+    return generate_telemetry_figure(ctx['fastest_lap_telemetry'])
+
+def stage_compare_fastest(ctx):
+    ctx['comparison'] = compare_laps(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, ctx['laps'], FIXTURE_DRIVERS,
+                                     position=True)
+    return ctx['comparison'].time
+
+def stage_comparison_plot(ctx):
+    return generate_comparison_figure(ctx['comparison'])
+
+def stage_compare_full_race(ctx):
+    laps_range = range(1, int(ctx['total_laps']) + 1)
+    return compare_laps(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, ctx['laps'], FIXTURE_DRIVERS, laps_range).time
+
+def stage_live_refresh(ctx):
+    # Each call ingests about one more lap of a replayed feed into a session already an hour in
+    if 'live' not in ctx:
+        path = os.path.join(session_store.STORE_DIR, "replay.jsonl")
+        record_replay(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, path)
+        ctx['live'], ctx['live_until'] = LiveSession(ReplayFeed(path)), pd.Timedelta(minutes=60)
+        ctx['live'].refresh(ctx['live_until'])
+    ctx['live_until'] += pd.Timedelta(seconds=90)
+    update = ctx['live'].refresh(ctx['live_until'])
+    return ctx['live'].summary, update.new_laps
+
+def stage_predict_single(ctx):
+    grid = build_scenario_point(20, 8, 'MEDIUM', WEATHER_SCENARIOS[0])
+    return predict_grid(load_circuit_model(MODEL_CIRCUIT), grid, ctx['weather'], FIXTURE_YEAR, DRIVER, 2)
+
+def stage_predict_sweep(ctx):
+    laps_range = range(1, int(ctx['total_laps']) + 1)
+    grid = build_scenario_grid(laps_range, laps_range, COMPOUNDS[3:7], WEATHER_SCENARIOS)
+    return predict_grid(load_circuit_model(MODEL_CIRCUIT), grid, ctx['weather'], FIXTURE_YEAR, DRIVER, 2)
+
+# One name per timed function (with the input as a suffix where a function is timed twice), so results
+# from different commits only ever compare the same work
+STAGES = [
+    ('load_session_data', stage_load_session),
+    ('get_driver_laps', stage_driver_laps),
+    ('load_driver_car_data', stage_driver_car_data),
+    ('get_driver_telemetry', stage_driver_telemetry),
+    ('load_laps_telemetry_cold', stage_fastest_lap_telemetry),
+    ('load_laps_telemetry_cached', stage_cached_lap_telemetry),
+    ('summarize_driver', stage_driver_summary),
+    ('build_session_summary', stage_session_summary),
+    ('get_driver_summary', stage_summary_lookup),
+    ('get_driver_stints', stage_stints_lookup),
+    ('generate_narr', stage_narrative),
+    ('generate_nerd_stats', stage_nerd_stats),
+    ('generate_strategy_plot', stage_strategy_plot),
+    ('fit_stint_degradation', stage_stint_degradation),
+    ('generate_field_degradation_chart', stage_degradation_plot),
+    ('generate_telemetry_figure', stage_telemetry_plot),
+    ('compare_laps_fastest', stage_compare_fastest),
+    ('generate_comparison_figure', stage_comparison_plot),
+    ('compare_laps_full_race', stage_compare_full_race),
+    ('live_session_refresh', stage_live_refresh),
+    ('predict_grid_single', stage_predict_single),
+    ('predict_grid_sweep', stage_predict_sweep),
+]
+assert len({name for name, _ in STAGES}) == len(STAGES), "stage names must be unique"
+
+
+
+# ----------- RUNNER -----------
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def measure_cold_import(repeats):
+    # A fresh interpreter per run, the way a new replica imports the page
+    code = ("import time; start = time.perf_counter(); import streamlit; mid = time.perf_counter(); "
+            f"import {', '.join(PAGE_MODULES)}; print(mid - start, time.perf_counter() - mid)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        runs.append([float(value) for value in output.stdout.split()])
+    return {'streamlit_seconds': statistics.median(run[0] for run in runs),
+            'page_seconds': statistics.median(run[1] for run in runs)}
+
+def run_stage(func, ctx, repeats):
+    output = func(ctx)  # warm-up, also fills ctx for the following stages
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = func(ctx)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'peak_bytes': peak,
+        'payload_bytes': payload_bytes(output)
+    }
+
+def run_benchmarks(repeats=5, stages=None):
+    # The fixture store lives in a temporary directory that is removed afterwards, whatever happens
+    store_dir = session_store.STORE_DIR
+    with tempfile.TemporaryDirectory(prefix="f1_bench_store_") as bench_store:
+        session_store.STORE_DIR = bench_store
+        try:
+            return _run_stages(repeats, stages)
+        finally:
+            session_store.STORE_DIR = store_dir
+
+def _run_stages(repeats, stages):
+    start = time.perf_counter()
+    session_store.write_session(FIXTURE_YEAR, FIXTURE_CIRCUIT, FIXTURE_SESSION, make_fixture_session())
+    results = {'commit': git_commit(), 'repeats': repeats,
+               'fixture_seconds': round(time.perf_counter() - start, 2),
+               'cold_import': measure_cold_import(repeats), 'stages': {}}
+
+    ctx = {}
+    for name, func in STAGES:
+        if stages and name not in stages:
+            # Dependencies still need to run once to populate the context
+            func(ctx)
+            continue
+        results['stages'][name] = run_stage(func, ctx, repeats)
+    return results
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, current in results['stages'].items():
+        previous = baseline['stages'].get(name)
+        if previous is None:
+            continue
+        slower = current['seconds'] > previous['seconds'] * threshold \
+            and current['seconds'] - previous['seconds'] > NOISE_FLOOR_SECONDS
+        heavier = current['peak_bytes'] > previous['peak_bytes'] * threshold
+        if slower or heavier:
+            regressions.append(name)
+    return regressions
+
+def print_report(results, baseline=None):
+    print(f"commit {results['commit']}, median of {results['repeats']} runs")
+    cold = results.get('cold_import')
+    if cold:
+        change = ""
+        if baseline and baseline.get('cold_import'):
+            change = f" ({cold['page_seconds'] / baseline['cold_import']['page_seconds']:.2f}x)"
+        print(f"cold import: streamlit {cold['streamlit_seconds'] * 1000:.0f} ms, "
+              f"page modules {cold['page_seconds'] * 1000:.0f} ms{change}")
+    print(f"{'stage':<34}{'time (ms)':>12}{'peak (KB)':>12}{'payload (KB)':>14}{'vs base':>10}")
+    for name, stage in results['stages'].items():
+        change = ""
+        if baseline and name in baseline['stages'] and baseline['stages'][name]['seconds'] > 0:
+            change = f"{stage['seconds'] / baseline['stages'][name]['seconds']:.2f}x"
+        print(f"{name:<34}{stage['seconds'] * 1000:>12.2f}{stage['peak_bytes'] / 1024:>12.0f}"
+              f"{stage['payload_bytes'] / 1024:>14.1f}{change:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's data and rendering hot paths.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--stages", nargs="+", help="Only report these stages")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store these results as {BASELINE_FILE}")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown/memory growth factor")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeats, args.stages)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{results['commit']}.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ Regressions over {args.threshold}x baseline ({baseline['commit']}): {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"✅ No regressions against baseline ({baseline['commit']})")
@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from benchmarks.fixture import make_fixture_laps
+from training_data import IMPUTE_KEYS, impute_groups
+
+IMPUTED = ['TyreLife', 'Stint', 'Compound']
+
+
+def legacy_impute(df):
+    # The notebook's per-group lambdas, kept as the reference the vectorized version must match
+    groups = df.groupby(IMPUTE_KEYS)
+    df['TyreLife'] = groups['TyreLife'].transform(lambda x: x.fillna(x.median()))
+    df['Stint'] = groups['Stint'].transform(lambda x: x.fillna(x.median()))
+    df['Compound'] = groups['Compound'].transform(lambda x: x.fillna(x.mode()[0]))
+    return df
+
+def vectorized_impute(df):
+    return impute_groups(df, IMPUTE_KEYS, median_columns=['TyreLife', 'Stint'], mode_columns=['Compound'])
+
+def time_impute(func, laps, repeats):
+    times = []
+    for _ in range(repeats):
+        df = laps.copy()
+        start = time.perf_counter()
+        result = func(df)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def check_empty_groups():
+    # One driver with no Compound at all at one circuit: the lambdas raise, the vectorized fill leaves it null
+    laps = make_fixture_laps(n_seasons=1, n_events=2, n_drivers=4, n_laps=10)
+    empty = (laps['Driver'] == laps['Driver'].iloc[0]) & (laps['EventName'] == laps['EventName'].iloc[0])
+    laps.loc[empty, 'Compound'] = np.nan
+    try:
+        legacy_impute(laps.copy())
+        legacy = "ok"
+    except Exception as e:
+        legacy = f"{type(e).__name__}: {e}"
+    filled = vectorized_impute(laps.copy())
+    return legacy, int(filled.loc[empty, 'Compound'].isna().sum()), int(filled.loc[~empty, 'Compound'].isna().sum())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark group-wise TyreLife/Stint/Compound imputation.")
+    parser.add_argument("--seasons", nargs="+", type=int, default=[7, 10, 14, 20],
+                        help="Seasons of synthetic laps (7 is the size of 2018-24)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"median of {args.repeats} runs, groups are ({', '.join(IMPUTE_KEYS)})")
+    print(f"{'seasons':>8}{'laps':>10}{'groups':>8}{'lambdas (ms)':>14}{'vectorized (ms)':>17}{'speedup':>9}")
+    mismatches = []
+    for n_seasons in args.seasons:
+        laps = make_fixture_laps(n_seasons)
+        legacy_seconds, expected = time_impute(legacy_impute, laps, args.repeats)
+        vectorized_seconds, result = time_impute(vectorized_impute, laps, args.repeats)
+        if not expected[IMPUTED].equals(result[IMPUTED]):
+            mismatches.append(n_seasons)
+        print(f"{n_seasons:>8}{len(laps):>10}{laps.groupby(IMPUTE_KEYS).ngroups:>8}"
+              f"{legacy_seconds * 1000:>14.1f}{vectorized_seconds * 1000:>17.1f}"
+              f"{legacy_seconds / vectorized_seconds:>8.1f}x")
+
+    legacy_error, empty_left, others_left = check_empty_groups()
+    print(f"all-null group: lambdas {legacy_error}; vectorized left {empty_left} laps null "
+          f"and {others_left} elsewhere")
+    if mismatches:
+        print(f"❌ Vectorized imputation differs from the lambdas at {', '.join(map(str, mismatches))} seasons")
+        sys.exit(1)
+    print("✅ Vectorized imputation matches the lambdas")
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from fastf1.core import Laps, Telemetry
+
+# Deterministic synthetic race used by the benchmarks, so they never touch the network
+FIXTURE_YEAR = 2024
+FIXTURE_CIRCUIT = "Benchmark Circuit"
+FIXTURE_SESSION = "Race"
+FIXTURE_DRIVERS = ['VER', 'PER', 'HAM', 'RUS', 'LEC', 'SAI', 'NOR', 'PIA', 'ALO', 'STR',
+                   'OCO', 'GAS', 'BOT', 'ZHO', 'TSU', 'RIC', 'ALB', 'SAR', 'MAG', 'HUL']
+LAP_LENGTH = 5300.0  # metres
+SAMPLE_HZ = 4.0
+
+
+class FixtureSession:
+    # Mimics the attributes of fastf1.core.Session that session_store.write_session reads
+    def __init__(self, laps, results, weather_data, car_data, pos_data, total_laps):
+        self.laps = Laps(laps, session=self)
+        self.results = results
+        self.weather_data = weather_data
+        self.car_data = car_data
+        self.pos_data = pos_data
+        self.total_laps = total_laps
+
+
+def _speed_profile(distance):
+    # Two long straights and a slow hairpin per lap
+    phase = 2 * np.pi * (distance % LAP_LENGTH) / LAP_LENGTH
+    return 210 + 95 * np.sin(phase) + 35 * np.sin(3 * phase)
+
+def make_fixture_session(n_drivers=20, n_laps=57, seed=7):
+    rng = np.random.default_rng(seed)
+    drivers = FIXTURE_DRIVERS[:n_drivers]
+    start = pd.Timedelta(minutes=55)
+    t0 = pd.Timestamp(f"{FIXTURE_YEAR}-03-02 15:00:00")
+
+    laps, car_data, pos_data = [], {}, {}
+    for position, code in enumerate(drivers, start=1):
+        number = str(position)
+        pit_lap = int(rng.integers(n_laps // 3, 2 * n_laps // 3))
+        lap_start = start
+        for lap_number in range(1, n_laps + 1):
+            stint = 1 if lap_number <= pit_lap else 2
+            tyre_life = lap_number if stint == 1 else lap_number - pit_lap
+            lap_seconds = 92.0 + 0.02 * position + 0.06 * tyre_life - 0.03 * lap_number + rng.normal(0, 0.25)
+            if lap_number == pit_lap:
+                lap_seconds += 21.0
+            lap_time = pd.Timedelta(seconds=lap_seconds)
+            sectors = np.array([0.31, 0.38, 0.31]) * lap_seconds
+            laps.append({
+                'Time': lap_start + lap_time, 'Driver': code, 'DriverNumber': number,
+                'LapTime': lap_time, 'LapNumber': float(lap_number), 'Stint': float(stint),
+                'PitOutTime': lap_start if lap_number == pit_lap + 1 else pd.NaT,
+                'PitInTime': lap_start + lap_time if lap_number == pit_lap else pd.NaT,
+                'Sector1Time': pd.Timedelta(seconds=sectors[0]), 'Sector2Time': pd.Timedelta(seconds=sectors[1]),
+                'Sector3Time': pd.Timedelta(seconds=sectors[2]),
+                'SpeedI1': rng.uniform(250, 290), 'SpeedI2': rng.uniform(230, 280),
+                'SpeedFL': rng.uniform(260, 300), 'SpeedST': rng.uniform(300, 335),
+                'IsPersonalBest': False, 'Compound': 'MEDIUM' if stint == 1 else 'HARD',
+                'TyreLife': float(tyre_life), 'FreshTyre': True, 'Team': 'Ferrari',
+                'LapStartTime': lap_start, 'LapStartDate': t0 + lap_start, 'TrackStatus': '1',
+                'Position': float(position), 'Deleted': False, 'DeletedReason': '',
+                'FastF1Generated': False, 'IsAccurate': lap_number not in (1, pit_lap, pit_lap + 1)
+            })
+            lap_start += lap_time
+
+        n_samples = int((lap_start - start).total_seconds() * SAMPLE_HZ) + 40
+        session_time = start - pd.Timedelta(seconds=5) + pd.to_timedelta(
+            np.arange(n_samples) / SAMPLE_HZ + rng.uniform(0, 0.02, n_samples), unit='s')
+        distance = np.cumsum(np.full(n_samples, LAP_LENGTH / 92.0 / SAMPLE_HZ))
+        speed = _speed_profile(distance) + rng.normal(0, 2, n_samples)
+        car_data[number] = Telemetry({
+            'Date': t0 + session_time, 'SessionTime': session_time, 'Time': session_time,
+            'RPM': 9000 + 30 * (speed - 150) + rng.normal(0, 100, n_samples), 'Speed': speed,
+            'nGear': np.clip((speed // 40).astype(int), 1, 8), 'Throttle': np.clip((speed - 120) * 0.6, 0, 100),
+            'Brake': np.gradient(speed) < -1.5, 'DRS': np.where(speed > 290, 12, 1), 'Source': 'car'
+        })
+        angle = 2 * np.pi * distance / LAP_LENGTH
+        pos_data[number] = Telemetry({
+            'Date': t0 + session_time, 'SessionTime': session_time, 'Time': session_time,
+            'X': 8000 * np.cos(angle), 'Y': 5000 * np.sin(angle), 'Z': rng.normal(0, 5, n_samples),
+            'Status': 'OnTrack', 'Source': 'pos'
+        })
+
+    numbers = [str(i) for i in range(1, n_drivers + 1)]
+    results = pd.DataFrame({
+        'DriverNumber': numbers, 'Abbreviation': drivers, 'FullName': [f"Driver {code}" for code in drivers],
+        'TeamName': 'Ferrari', 'Position': np.arange(1.0, n_drivers + 1), 'Status': 'Finished',
+        'Time': pd.to_timedelta(np.arange(n_drivers) * 3.1, unit='s')
+    }, index=numbers)
+
+    minutes = np.arange(0, int(lap_start.total_seconds() / 60) + 1)
+    weather = pd.DataFrame({
+        'Time': pd.to_timedelta(minutes, unit='min'), 'AirTemp': 27 + rng.normal(0, 0.3, len(minutes)),
+        'Humidity': 45 + rng.normal(0, 1, len(minutes)), 'Pressure': 1012 + rng.normal(0, 0.2, len(minutes)),
+        'Rainfall': False, 'TrackTemp': 38 + rng.normal(0, 0.5, len(minutes)),
+        'WindDirection': rng.integers(0, 360, len(minutes)), 'WindSpeed': rng.uniform(0.5, 3, len(minutes))
+    })
+    return FixtureSession(pd.DataFrame(laps), results, weather, car_data, pos_data, n_laps)
+
+def make_fixture_laps(n_seasons=7, n_events=22, n_drivers=20, n_laps=55, null_fraction=0.02, seed=7):
+    # Shard-shaped clean laps for several seasons, with gaps in TyreLife/Stint/Compound to impute;
+    # three seats change hands every season, so the (Driver, EventName) groups grow with the history
+    rng = np.random.default_rng(seed)
+    compounds = np.array(['SOFT', 'MEDIUM', 'HARD', 'INTERMEDIATE', 'WET'])
+    first_year = FIXTURE_YEAR - n_seasons + 1
+    seasons = []
+    for season in range(n_seasons):
+        drivers = np.array([f"D{(season * 3 + i) % (n_drivers + 3 * n_seasons):03d}" for i in range(n_drivers)])
+        n_rows = n_events * n_drivers * n_laps
+        stint = rng.integers(1, 4, n_rows)
+        seasons.append(pd.DataFrame({
+            'Driver': np.tile(np.repeat(drivers, n_laps), n_events),
+            'LapTime': pd.to_timedelta(rng.normal(92.0, 1.5, n_rows), unit='s'),
+            'LapNumber': np.tile(np.arange(1.0, n_laps + 1), n_events * n_drivers),
+            'Stint': stint.astype(float), 'Compound': compounds[np.minimum(stint, 3) - 1].astype(object),
+            'TyreLife': rng.integers(1, 30, n_rows).astype(float),
+            'AirTemp': rng.normal(27, 3, n_rows), 'Humidity': rng.normal(45, 8, n_rows),
+            'Pressure': rng.normal(1012, 2, n_rows), 'Rainfall': rng.random(n_rows) < 0.05,
+            'TrackTemp': rng.normal(38, 5, n_rows), 'WindDirection': rng.integers(0, 360, n_rows),
+            'WindSpeed': rng.uniform(0.5, 3, n_rows),
+            'EventName': np.repeat([f"Circuit {event:02d} Grand Prix" for event in range(n_events)], n_drivers * n_laps),
+            'Year': first_year + season
+        }))
+    laps = pd.concat(seasons, ignore_index=True)
+    for column in ('TyreLife', 'Stint', 'Compound'):
+        laps.loc[rng.random(len(laps)) < null_fraction, column] = np.nan
+    return laps
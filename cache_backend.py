@@ -0,0 +1,361 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from instrumentation import record_cache
+
+CACHE_PREFIX = "f1dash:v1"  # bump when the serialized format changes
+MEMORY_CACHE_MB = int(os.environ.get("F1_CACHE_MEMORY_MB", 256))
+DISK_CACHE_DIR = os.environ.get("F1_CACHE_DIR", "./cache")
+DISK_CACHE_MB = int(os.environ.get("F1_CACHE_DISK_MB", 2048))  # 0 disables the disk tier
+REDIS_URL = os.environ.get("F1_CACHE_REDIS_URL")  # e.g. redis://localhost:6379/0, unset disables the shared tier
+DEFAULT_TTL = int(os.environ.get("F1_CACHE_TTL", 7 * 24 * 60 * 60))
+
+MAGIC = b"F1C1"
+logger = logging.getLogger(__name__)
+
+
+# ----------- SERIALIZATION -----------
+def serialize(value):
+    # JSON for the structure and scalars, one Arrow IPC stream per frame; nothing is pickled
+    from fastf1.core import Laps
+    frames = []
+
+    def encode(item):
+        if isinstance(item, pd.DataFrame):
+            frames.append(item)
+            return {'__frame__': len(frames) - 1, 'laps': isinstance(item, Laps)}
+        if isinstance(item, (tuple, list)):
+            return {'__seq__': [encode(v) for v in item], 'tuple': isinstance(item, tuple)}
+        if isinstance(item, dict):
+            return {'__map__': {str(key): encode(v) for key, v in item.items()}}
+        if isinstance(item, np.generic):
+            return item.item()
+        if item is None or isinstance(item, (bool, int, float, str)):
+            return item
+        raise TypeError(f"Cannot cache values of type {type(item).__name__}")
+
+    header = json.dumps(encode(value)).encode("utf-8")
+    parts = [MAGIC, struct.pack("<I", len(header)), header]
+    for frame in frames:
+        table = pa.Table.from_pandas(pd.DataFrame(frame), preserve_index=True)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+        parts += [struct.pack("<Q", buffer.size), buffer.to_pybytes()]
+    return b"".join(parts)
+
+def deserialize(payload):
+    from fastf1.core import Laps
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a cache payload")
+    view = memoryview(payload)
+    (header_size,) = struct.unpack_from("<I", payload, 4)
+    offset = 8 + header_size
+    tree = json.loads(bytes(view[8:offset]))
+
+    frames = []
+    while offset < len(payload):
+        (size,) = struct.unpack_from("<Q", payload, offset)
+        offset += 8
+        frames.append(pa.ipc.open_stream(pa.py_buffer(view[offset:offset + size])).read_all().to_pandas())
+        offset += size
+
+    def decode(item):
+        if isinstance(item, dict):
+            if '__frame__' in item:
+                frame = frames[item['__frame__']]
+                return Laps(frame) if item['laps'] else frame
+            if '__seq__' in item:
+                values = [decode(v) for v in item['__seq__']]
+                return tuple(values) if item['tuple'] else values
+            return {key: decode(v) for key, v in item['__map__'].items()}
+        return item
+    return decode(tree)
+
+
+# ----------- TIERS -----------
+class MemoryTier:
+    # LRU of serialized payloads, so the bound is exact and callers always get their own copy
+    name = 'memory'
+
+    def __init__(self, max_bytes=MEMORY_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        # (payload, expiry timestamp or None) like every tier, so promotion keeps the entry's lifetime
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires = entry
+            if expires and expires < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, payload, ttl=None):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (payload, time.time() + ttl if ttl else None)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def clear(self, prefix=""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._drop(key)
+
+    def info(self):
+        return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+class DiskTier:
+    # One file per key, an 8-byte expiry header then the payload; least recently read files go first
+    name = 'disk'
+
+    def __init__(self, root=DISK_CACHE_DIR, max_bytes=DISK_CACHE_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = sum(os.path.getsize(path) for path, _ in self._files())
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split(":")) + ".bin"
+
+    def _files(self):
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".bin"):
+                    path = os.path.join(directory, name)
+                    yield path, os.path.getmtime(path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                (expires,) = struct.unpack("<d", f.read(8))
+                payload = f.read() if not expires or expires >= time.time() else None
+            if payload is None:
+                size = os.path.getsize(path)
+                os.remove(path)
+                with self._lock:
+                    self._bytes = max(0, self._bytes - size)
+                return None
+            os.utime(path)
+            return payload, expires or None
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning("Disk cache read failed for %s: %s", key, e)
+            return None
+
+    def set(self, key, payload, ttl=None):
+        if len(payload) + 8 > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(struct.pack("<d", time.time() + ttl if ttl else 0.0))
+            f.write(payload)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._bytes += len(payload) + 8 - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other replicas share the directory, so the real size is re-read before evicting
+        files = sorted(self._files(), key=lambda item: item[1])
+        self._bytes = sum(os.path.getsize(path) for path, _ in files)
+        for path, _ in files:
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._bytes -= size
+            except OSError:
+                continue
+
+    def clear(self, prefix=""):
+        for path, _ in list(self._files()):
+            key = os.path.relpath(path, self.root)[:-len(".bin")].replace(os.sep, ":")
+            if key.startswith(prefix):
+                os.remove(path)
+        with self._lock:
+            self._bytes = sum(os.path.getsize(path) for path, _ in self._files())
+
+    def info(self):
+        return {'root': self.root, 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+class RedisTier:
+    # Shared between replicas; size limits are the server's job (maxmemory + allkeys-lru)
+    name = 'shared'
+    RETRY_SECONDS = 30
+
+    def __init__(self, url=REDIS_URL, max_value_bytes=512 * 1024 * 1024):
+        import redis
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.url = url
+        self.max_value_bytes = max_value_bytes
+        self._down_until = 0.0
+
+    def _call(self, method, *args, **kwargs):
+        # An unreachable server is skipped for a while instead of stalling every page load
+        if time.time() < self._down_until:
+            return None
+        try:
+            return (getattr(self._client, method) if isinstance(method, str) else method)(*args, **kwargs)
+        except self._errors as e:
+            logger.warning("Shared cache unavailable (%s), retrying in %ss", e, self.RETRY_SECONDS)
+            self._down_until = time.time() + self.RETRY_SECONDS
+            return None
+
+    def _get_with_ttl(self, key):
+        pipe = self._client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        return pipe.execute()
+
+    def get(self, key):
+        result = self._call(self._get_with_ttl, key)
+        if result is None or result[0] is None:
+            return None
+        payload, pttl = result
+        # PTTL is -1 for keys without an expiry
+        return payload, time.time() + pttl / 1000 if pttl > 0 else None
+
+    def set(self, key, payload, ttl=None):
+        if len(payload) <= self.max_value_bytes:
+            self._call('set', key, payload, px=max(1, int(ttl * 1000)) if ttl else None)
+
+    def clear(self, prefix=""):
+        keys = self._call('keys', f"{prefix}*") or []
+        if keys:
+            self._call('delete', *keys)
+
+    def info(self):
+        return {'url': self.url, 'available': time.time() >= self._down_until}
+
+
+# ----------- TIERED CACHE -----------
+class TieredCache:
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self.hits = defaultdict(int)
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        tiers = [MemoryTier()]
+        if DISK_CACHE_MB > 0:
+            tiers.append(DiskTier())
+        if REDIS_URL:
+            try:
+                tiers.append(RedisTier())
+            except ImportError:
+                logger.warning("F1_CACHE_REDIS_URL is set but the redis package is not installed")
+        return cls(tiers)
+
+    def get(self, key, record=True):
+        # A hit in a lower tier is copied into the faster tiers above it, for the time it has left
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None:
+                payload, expires = entry
+                if record:
+                    self.hits[tier.name] += 1
+                remaining = expires - time.time() if expires else None
+                if remaining is None or remaining > 0:
+                    for upper in self.tiers[:i]:
+                        upper.set(key, payload, remaining)
+                return payload
+        if record:
+            self.misses += 1
+        return None
+
+    def set(self, key, payload, ttl=None):
+        for tier in self.tiers:
+            tier.set(key, payload, ttl)
+
+    def clear(self, prefix=CACHE_PREFIX):
+        for tier in self.tiers:
+            tier.clear(prefix)
+
+    def cache_info(self):
+        return {'hits': dict(self.hits), 'misses': self.misses,
+                'tiers': {tier.name: tier.info() for tier in self.tiers}}
+
+
+@st.cache_resource
+def get_cache():
+    return TieredCache.from_env()
+
+def cache_key(namespace, args, kwargs):
+    arguments = json.dumps([args, sorted(kwargs.items())], default=str, sort_keys=True)
+    return f"{CACHE_PREFIX}:{namespace}:{hashlib.sha1(arguments.encode('utf-8')).hexdigest()}"
+
+def cached(namespace, ttl=DEFAULT_TTL, show_spinner=None):
+    # Drop-in for st.cache_data on functions returning frames, tuples of frames and JSON scalars
+    def decorator(func):
+        key_locks = {}  # [lock, waiters] per key being computed, removed once its value is cached
+        guard = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            key = cache_key(namespace, args, kwargs)
+            payload = cache.get(key)
+            record_cache(namespace, hits=payload is not None, misses=payload is None)
+            if payload is None:
+                # One computation per key in this process; concurrent callers wait for it
+                with guard:
+                    entry = key_locks.setdefault(key, [threading.Lock(), 0])
+                    entry[1] += 1
+                try:
+                    with entry[0]:
+                        payload = cache.get(key, record=False)
+                        if payload is None:
+                            with st.spinner(show_spinner) if show_spinner else nullcontext():
+                                value = func(*args, **kwargs)
+                            payload = serialize(value)
+                            cache.set(key, payload, ttl)
+                            return value
+                finally:
+                    with guard:
+                        entry[1] -= 1
+                        if not entry[1]:
+                            del key_locks[key]
+            return deserialize(payload)
+
+        wrapper.clear = lambda: get_cache().clear(f"{CACHE_PREFIX}:{namespace}:")
+        return wrapper
+    return decorator
@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from telemetry import load_laps_telemetry
+
+DISTANCE_STEP = 5.0  # metres between resampled points
+MINI_SECTORS = 25
+COMPARISON_CHANNELS = ['Speed', 'Throttle', 'Brake', 'nGear', 'RPM']
+POSITION_CHANNELS = ['X', 'Y']
+
+
+@dataclass
+class LapComparison:
+    labels: list
+    drivers: list
+    lap_numbers: list
+    distance: np.ndarray
+    lap_times: np.ndarray
+    time: np.ndarray
+    channels: dict = field(default_factory=dict)
+    reference: int = 0
+
+    @property
+    def delta(self):
+        # Time gained (negative) or lost (positive) against the reference lap at every grid point
+        return self.time - self.time[self.reference]
+
+    def mini_sectors(self, n_sectors=MINI_SECTORS):
+        bounds = np.linspace(0, len(self.distance) - 1, n_sectors + 1).astype(int)
+        sector_times = self.time[:, bounds[1:]] - self.time[:, bounds[:-1]]
+        return bounds, sector_times, np.argmin(sector_times, axis=0)
+
+
+def select_laps(all_laps, drivers, lap_numbers=None):
+    # Each driver's fastest lap, or the given lap numbers for every driver
+    laps = all_laps.pick_drivers(drivers)
+    laps = laps[laps['LapTime'].notnull()]
+    if lap_numbers is not None:
+        return laps[laps['LapNumber'].isin(lap_numbers)]
+    fastest = laps.groupby('Driver')['LapTime'].idxmin().reindex(drivers).dropna()
+    return laps.loc[fastest]
+
+def load_comparison_telemetry(year, circuit, racetype, laps, position=False):
+    # Served from the per-lap telemetry cache, one store read per driver at most
+    frames = []
+    for driver_code, driver_laps in laps.groupby('Driver', sort=False):
+        telemetry = load_laps_telemetry(year, circuit, racetype, driver_code, driver_laps, position=position)
+        if not telemetry.empty:
+            frames.append((driver_code, telemetry))
+    return frames
+
+def resample_laps(frames, step=DISTANCE_STEP, channels=COMPARISON_CHANNELS):
+    # frames: (driver, telemetry) pairs, each holding one or more laps with a per-lap Distance.
+    # All laps are interpolated in one np.interp call by shifting each lap onto its own distance band.
+    frames = [(driver_code, telemetry) for driver_code, telemetry in frames if len(telemetry) >= 2]
+    if not frames:
+        return None
+    channels = [name for name in channels if all(name in telemetry.columns for _, telemetry in frames)]
+
+    def column(name, dtype='float64'):
+        return np.concatenate([telemetry[name].to_numpy(dtype=dtype) for _, telemetry in frames])
+
+    numbers = column('LapNumber', 'int64')
+    frame_of = np.repeat(np.arange(len(frames)), [len(telemetry) for _, telemetry in frames])
+    starts = np.concatenate(([0], np.flatnonzero((numbers[1:] != numbers[:-1]) | (frame_of[1:] != frame_of[:-1])) + 1))
+    ends = np.append(starts[1:], len(numbers)) - 1
+    keep = ends > starts  # a single sample can't be interpolated
+    starts, ends = starts[keep], ends[keep]
+    lap_of = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    rows = np.arange(len(numbers)) if keep.all() else \
+        np.concatenate([np.arange(start, end + 1) for start, end in zip(starts, ends)])
+
+    distance = column('Distance')[rows]
+    seconds = column('Time', 'timedelta64[ns]')[rows] / np.timedelta64(1, 's')
+    offsets = np.cumsum(ends - starts + 1) - (ends - starts + 1)
+    first = distance[offsets]
+    last = distance[offsets + (ends - starts)]
+
+    # Common grid up to the shortest lap; queries outside a lap's samples clamp to its ends
+    grid = np.arange(0.0, last.min(), step)
+    band = float(last.max()) + step
+    shifted = distance + lap_of * band
+    queries = (np.clip(grid[None, :], first[:, None], last[:, None]) + np.arange(len(starts))[:, None] * band).ravel()
+    shape = (len(starts), len(grid))
+
+    time = np.interp(queries, shifted, seconds).reshape(shape)
+    resampled = {name: np.interp(queries, shifted, column(name)[rows]).reshape(shape) for name in channels}
+
+    drivers = [frames[i][0] for i in frame_of[starts]]
+    lap_numbers = numbers[starts].tolist()
+    return LapComparison(
+        labels=[f"{driver} L{lap}" for driver, lap in zip(drivers, lap_numbers)],
+        drivers=drivers,
+        lap_numbers=lap_numbers,
+        distance=grid,
+        lap_times=seconds[offsets + (ends - starts)],
+        time=time,
+        channels=resampled,
+        reference=int(np.argmin(seconds[offsets + (ends - starts)]))
+    )
+
+def compare_laps(year, circuit, racetype, all_laps, drivers, lap_numbers=None, position=False, step=DISTANCE_STEP):
+    laps = select_laps(all_laps, drivers, lap_numbers)
+    if laps.empty:
+        return None
+    channels = COMPARISON_CHANNELS + (POSITION_CHANNELS if position else [])
+    return resample_laps(load_comparison_telemetry(year, circuit, racetype, laps, position), step, channels)
+
+def mini_sector_table(comparison, n_sectors=MINI_SECTORS):
+    bounds, sector_times, winners = comparison.mini_sectors(n_sectors)
+    best = sector_times[winners, np.arange(n_sectors)]
+    runner_up = np.sort(sector_times, axis=0)[1] if len(comparison.labels) > 1 else np.full(n_sectors, np.nan)
+    return pd.DataFrame({
+        'MiniSector': np.arange(1, n_sectors + 1),
+        'Start': comparison.distance[bounds[:-1]],
+        'End': comparison.distance[bounds[1:]],
+        'Fastest': np.asarray(comparison.labels, dtype=object)[winners],
+        'Time': best,
+        'GapToSecond': runner_up - best
+    })
@@ -45,6 +45,16 @@ CIRCUIT_IMAGE_MAP = {
 
 SESSION_TYPES = ['Race', 'Qualifying', 'Practice 1', 'Practice 2', 'Practice 3']
 
+TELEMETRY_MAX_POINTS = 500
+
+# Display width in pixels of each asset group on the page; converter.py builds a variant for each width
+ASSET_WIDTHS = {
+    'logo': 100,
+    'teams': 100,
+    'drivers': 280,
+    'circuits': 500
+}
+
 DRIVERS_2024 = {
     'VER': 'Verstappen',
     'PER': 'Perez',
@@ -0,0 +1,143 @@
+import argparse
+import json
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fastf1 as ff
+import pandas as pd
+from session_store import load_fastf1_session, safe_name
+from weather_features import WeatherIndex
+
+logging.getLogger("fastf1").setLevel(logging.ERROR)
+
+SHARDS_DIR = "./data/shards"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_YEARS = [2024, 2023, 2022, 2021, 2020, 2019, 2018]
+
+
+def shard_key(year, event, session_type):
+    return f"{year}/{safe_name(event)}/{safe_name(session_type)}"
+
+def shard_path(shards_dir, year, event, session_type):
+    return os.path.join(shards_dir, str(year), f"{safe_name(event)}_{safe_name(session_type)}.parquet")
+
+
+# ----------- MANIFEST -----------
+def load_manifest(shards_dir=SHARDS_DIR):
+    path = os.path.join(shards_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, shards_dir=SHARDS_DIR):
+    os.makedirs(shards_dir, exist_ok=True)
+    path = os.path.join(shards_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_complete(manifest, shards_dir, year, event, session_type):
+    entry = manifest.get(shard_key(year, event, session_type))
+    return (entry is not None and entry['status'] == 'done'
+            and os.path.exists(shard_path(shards_dir, year, event, session_type)))
+
+
+# ----------- SESSION PROCESSING -----------
+def process_session(year, event, session_type):
+    session = load_fastf1_session(year, event, session_type, telemetry=False)
+
+    # Same weather index as the predictor's scenarios: weather sorted once, laps matched in one pass
+    laps_with_weather = WeatherIndex(session.weather_data).attach(pd.DataFrame(session.laps))
+
+    clean_laps = laps_with_weather.loc[laps_with_weather['IsAccurate'] == True].copy()
+    clean_laps = clean_laps.dropna(subset=['LapTime'])
+    clean_laps['EventName'] = event
+    clean_laps['Year'] = year
+    return clean_laps
+
+def build_shard(year, event, session_type, shards_dir):
+    # Runs in a worker process: only this session's frame is ever held in memory
+    start = time.perf_counter()
+    try:
+        clean_laps = process_session(year, event, session_type)
+        path = shard_path(shards_dir, year, event, session_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        clean_laps.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return {'status': 'done', 'rows': len(clean_laps), 'path': path,
+                'seconds': round(time.perf_counter() - start, 2)}
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                'traceback': traceback.format_exc(limit=5),
+                'seconds': round(time.perf_counter() - start, 2)}
+
+
+# ----------- BUILD -----------
+def list_jobs(years, session_type='R'):
+    jobs = []
+    for year in years:
+        schedule = ff.get_event_schedule(year, include_testing=False)
+        for event in schedule['EventName']:
+            jobs.append((year, event, session_type))
+    return jobs
+
+def build_dataset(years=DEFAULT_YEARS, session_type='R', shards_dir=SHARDS_DIR, workers=None, retry_failed=True):
+    manifest = load_manifest(shards_dir)
+    jobs = []
+    for year, event, stype in list_jobs(years, session_type):
+        if is_complete(manifest, shards_dir, year, event, stype):
+            continue
+        entry = manifest.get(shard_key(year, event, stype))
+        if entry is not None and entry['status'] == 'failed' and not retry_failed:
+            continue
+        jobs.append((year, event, stype))
+
+    print(f"{len(jobs)} sessions to process, {len(manifest)} already in the manifest")
+    if not jobs:
+        return manifest
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_shard, year, event, stype, shards_dir): (year, event, stype)
+                   for year, event, stype in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            year, event, stype = futures[future]
+            result = future.result()
+            result.update({'year': year, 'event': event, 'session': stype,
+                           'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S")})
+            manifest[shard_key(year, event, stype)] = result
+            # Checkpoint after every shard so an interrupted run resumes where it stopped
+            save_manifest(manifest, shards_dir)
+
+            if result['status'] == 'done':
+                print(f"[{done}/{len(jobs)}] ✅ {year} {event}: {result['rows']} laps ({result['seconds']}s)")
+            else:
+                print(f"[{done}/{len(jobs)}] ❌ {year} {event}: {result['error']}")
+    return manifest
+
+def load_dataset(shards_dir=SHARDS_DIR, columns=None):
+    manifest = load_manifest(shards_dir)
+    paths = [entry['path'] for _, entry in sorted(manifest.items())
+             if entry['status'] == 'done' and os.path.exists(entry['path'])]
+    if not paths:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(path, columns=columns) for path in paths], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the lap-level training dataset as one Parquet shard per session.")
+    parser.add_argument("--years", nargs="+", type=int, default=DEFAULT_YEARS)
+    parser.add_argument("--session", default="R", help="Session identifier passed to FastF1 (default: R)")
+    parser.add_argument("--out", default=SHARDS_DIR, help="Directory for shards and manifest.json")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--skip-failed", action="store_true", help="Don't retry shards that failed previously")
+    parser.add_argument("--csv", help="Also combine all shards into this CSV file")
+    args = parser.parse_args()
+
+    build_dataset(args.years, args.session, args.out, args.workers, retry_failed=not args.skip_failed)
+    if args.csv:
+        load_dataset(args.out).to_csv(args.csv, index=False)
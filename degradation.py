@@ -0,0 +1,128 @@
+import os
+import numpy as np
+import pandas as pd
+import session_store
+from cache_backend import cached
+from telemetry import LAP_COLUMNS
+
+FUEL_SECONDS_PER_LAP = 0.035  # lap time gained per lap of fuel burned
+MIN_STINT_LAPS = 5
+QUICK_LAP_FACTOR = 1.07
+
+
+def clean_stint_laps(laps):
+    # Green-flag racing laps only: no pit in/out laps, inaccurate timing or slow outliers
+    laps = pd.DataFrame(laps)
+    valid = laps['LapTime'].notna() & laps['Stint'].notna() & laps['TyreLife'].notna() \
+        & laps['PitInTime'].isna() & laps['PitOutTime'].isna()
+    if 'IsAccurate' in laps.columns:
+        valid &= laps['IsAccurate'].fillna(False).astype(bool)
+    if 'TrackStatus' in laps.columns:
+        valid &= laps['TrackStatus'].astype(str) == '1'
+    laps = laps[valid]
+    if laps.empty:
+        return laps
+    fastest = laps.groupby('Driver')['LapTime'].transform('min')
+    return laps[laps['LapTime'] <= fastest * QUICK_LAP_FACTOR]
+
+def fit_stint_degradation(laps, total_laps=None):
+    # Least-squares line of fuel-corrected lap time against tyre life, for every stint in one pass
+    laps = clean_stint_laps(laps)
+    if laps.empty:
+        return pd.DataFrame()
+
+    codes = laps.groupby(['Driver', 'Stint'], sort=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    lap_numbers = laps['LapNumber'].to_numpy(dtype='float64')[order]
+    tyre_life = laps['TyreLife'].to_numpy(dtype='float64')[order]
+    seconds = (laps['LapTime'].to_numpy(dtype='timedelta64[ns]') / np.timedelta64(1, 's'))[order]
+    # Every lap is normalised to an empty tank, so the slope is tyre wear rather than fuel burn
+    total_laps = total_laps or lap_numbers.max()
+    corrected = seconds - FUEL_SECONDS_PER_LAP * (total_laps - lap_numbers)
+
+    def total(values):
+        return np.add.reduceat(values, starts)
+
+    n = np.diff(np.append(starts, len(codes))).astype('float64')
+    sum_x, sum_y = total(tyre_life), total(corrected)
+    var_x = n * total(tyre_life * tyre_life) - sum_x ** 2
+    var_y = n * total(corrected * corrected) - sum_y ** 2
+    cov_xy = n * total(tyre_life * corrected) - sum_x * sum_y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(var_x > 0, cov_xy / var_x, np.nan)
+        r2 = np.where((var_x > 0) & (var_y > 0), cov_xy ** 2 / (var_x * var_y), np.nan)
+
+    rows = order[starts]
+    fits = pd.DataFrame({
+        'Driver': laps['Driver'].to_numpy()[rows],
+        'Team': laps['Team'].to_numpy()[rows],
+        'Stint': laps['Stint'].to_numpy()[rows].astype('int64'),
+        'Compound': laps['Compound'].astype(object).to_numpy()[rows],
+        'Laps': n.astype('int64'),
+        'TyreLifeStart': np.minimum.reduceat(tyre_life, starts),
+        'TyreLifeEnd': np.maximum.reduceat(tyre_life, starts),
+        'Slope': slope,
+        'Intercept': (sum_y - slope * sum_x) / n,
+        'MeanPace': sum_y / n,
+        'R2': r2
+    })
+    return fits[fits['Laps'] >= MIN_STINT_LAPS].reset_index(drop=True)
+
+def compound_degradation(fits):
+    # Field-wide slope per compound, each stint weighted by its number of laps
+    if fits.empty:
+        return pd.DataFrame(columns=['Compound', 'Stints', 'Laps', 'MaxTyreLife', 'Slope'])
+    weighted = fits[fits['Slope'].notna()].assign(WeightedSlope=lambda df: df['Slope'] * df['Laps'])
+    summary = weighted.groupby('Compound', sort=False).agg(
+        Stints=('Slope', 'size'),
+        Laps=('Laps', 'sum'),
+        MaxTyreLife=('TyreLifeEnd', 'max'),
+        WeightedSlope=('WeightedSlope', 'sum')
+    )
+    summary['Slope'] = summary.pop('WeightedSlope') / summary['Laps']
+    return summary.reset_index()
+
+
+# ----------- SESSION DEGRADATION TABLE -----------
+def has_stint_degradation(year, circuit, racetype):
+    entry = session_store.get_session_entry(year, circuit, racetype)
+    if entry is None or 'degradation' not in entry['tables']:
+        return False
+    return os.path.exists(session_store.table_path(year, circuit, racetype, 'degradation'))
+
+def build_stint_degradation(year, circuit, racetype):
+    if not session_store.has_session(year, circuit, racetype):
+        session = session_store.load_fastf1_session(year, circuit, racetype, telemetry=False)
+        session_store.write_session(year, circuit, racetype, session)
+    all_laps, _, total_laps, _ = session_store.read_session(year, circuit, racetype, LAP_COLUMNS)
+    fits = fit_stint_degradation(all_laps, total_laps)
+
+    table = session_store._write_table(fits, session_store.table_path(year, circuit, racetype, 'degradation'))
+
+    def add_table(entry):
+        entry['tables']['degradation'] = table
+        return entry
+    session_store.update_entry(session_store.session_key(year, circuit, racetype), add_table)
+    return fits
+
+@cached("stint_degradation", show_spinner="Fitting Tyre Degradation...")
+def load_stint_degradation(year, circuit, racetype):
+    if not has_stint_degradation(year, circuit, racetype):
+        return build_stint_degradation(year, circuit, racetype)
+    return session_store.read_table(session_store.table_path(year, circuit, racetype, 'degradation'))
+
+def tyre_life_check(fits, compound, tyre_life):
+    # Warns when a predictor input is outside what the field actually ran in this session
+    if fits.empty:
+        return None
+    field = compound_degradation(fits[fits['Compound'] == compound])
+    if field.empty:
+        return f"No clean {compound} stints were run in this session, so the model is extrapolating."
+    longest, slope = int(field['MaxTyreLife'].iloc[0]), field['Slope'].iloc[0]
+    if tyre_life > longest:
+        return (f"Tyre age {tyre_life} is beyond the longest {compound} stint of this session ({longest} laps). "
+                f"The field lost {slope:+.3f}s per lap on this compound.")
+    return None
@@ -0,0 +1,263 @@
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+METRICS_LOG = os.environ.get("F1_METRICS_LOG")  # JSONL file, one line per rerun; unset disables it
+METRICS_PORT = int(os.environ.get("F1_METRICS_PORT", 0))  # Prometheus text on /metrics; 0 disables it
+METRICS_PREFIX = "f1dash"
+RECENT_SAMPLES = 1000  # durations kept per stage for the percentiles
+QUANTILES = (0.5, 0.95, 0.99)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RerunTrace:
+    page: str
+    started_at: float = field(default_factory=time.time)
+    start: float = field(default_factory=time.perf_counter)
+    spans: list = field(default_factory=list)
+    cache: dict = field(default_factory=lambda: defaultdict(lambda: {'hit': 0, 'miss': 0}))
+    tags: dict = field(default_factory=dict)
+    depth: int = 0
+    seconds: float = None
+
+    @property
+    def import_seconds(self):
+        return sum(seconds for name, _, seconds, _ in self.spans if name.startswith("import"))
+
+    def as_dict(self):
+        totals = defaultdict(float)
+        for name, _, seconds, _ in self.spans:
+            totals[name] += seconds
+        return {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            'page': self.page,
+            'seconds': round(self.seconds, 4) if self.seconds is not None else None,
+            'import_seconds': round(self.import_seconds, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in totals.items()},
+            'cache': {name: dict(counts) for name, counts in self.cache.items()},
+            **self.tags
+        }
+
+# Each Streamlit session runs its script in its own thread, so the active trace is per context
+_active = ContextVar('active_rerun', default=None)
+
+
+class Metrics:
+    # Process-wide stage timings and cache counters, shared by every session of this server
+    def __init__(self, recent=RECENT_SAMPLES):
+        self._lock = threading.Lock()
+        self._recent = recent
+        self.stages = {}
+        self.cache = defaultdict(lambda: {'hit': 0, 'miss': 0})
+        self.reruns = 0
+        self.cold_start = None  # first rerun of this process: total and import seconds
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                             'recent': deque(maxlen=self._recent)}
+            stage['count'] += 1
+            stage['sum'] += seconds
+            stage['max'] = max(stage['max'], seconds)
+            stage['recent'].append(seconds)
+
+    def count_rerun(self, seconds, import_seconds=0.0):
+        self.observe('rerun', seconds)
+        with self._lock:
+            if self.cold_start is None:
+                self.cold_start = {'rerun_seconds': seconds, 'import_seconds': import_seconds}
+            self.reruns += 1
+
+    def count_cache(self, name, hits=0, misses=0):
+        with self._lock:
+            self.cache[name]['hit'] += hits
+            self.cache[name]['miss'] += misses
+
+    def stage_table(self):
+        with self._lock:
+            rows = [(name, stage['count'], stage['sum'], stage['max'], np.array(stage['recent']))
+                    for name, stage in self.stages.items()]
+        table = pd.DataFrame([{
+            'Stage': name,
+            'Count': count,
+            'Mean (ms)': total / count * 1000,
+            **{f"p{q * 100:g} (ms)": np.quantile(recent, q) * 1000 for q in QUANTILES},
+            'Max (ms)': worst * 1000
+        } for name, count, total, worst, recent in rows])
+        return table.sort_values(f"p{QUANTILES[1] * 100:g} (ms)", ascending=False) if not table.empty else table
+
+    def cache_table(self):
+        with self._lock:
+            counts = {name: dict(values) for name, values in self.cache.items()}
+        table = pd.DataFrame([{'Cache': name, 'Hits': c['hit'], 'Misses': c['miss'],
+                               'Hit Rate': c['hit'] / (c['hit'] + c['miss']) if c['hit'] + c['miss'] else 0.0}
+                              for name, c in counts.items()])
+        return table.sort_values('Cache') if not table.empty else table
+
+    def prometheus_text(self):
+        with self._lock:
+            stages = {name: (stage['count'], stage['sum'], np.array(stage['recent']))
+                      for name, stage in self.stages.items()}
+            cache = {name: dict(values) for name, values in self.cache.items()}
+            reruns = self.reruns
+            cold_start = dict(self.cold_start or {})
+
+        lines = [f"# HELP {METRICS_PREFIX}_stage_seconds Time spent in each dashboard stage",
+                 f"# TYPE {METRICS_PREFIX}_stage_seconds summary"]
+        for name, (count, total, recent) in sorted(stages.items()):
+            for q in QUANTILES:
+                lines.append(f'{METRICS_PREFIX}_stage_seconds{{stage="{name}",quantile="{q}"}} '
+                             f'{np.quantile(recent, q):.6f}')
+            lines.append(f'{METRICS_PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{METRICS_PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines += [f"# HELP {METRICS_PREFIX}_cache_requests_total Cache lookups by cache and result",
+                  f"# TYPE {METRICS_PREFIX}_cache_requests_total counter"]
+        for name, counts in sorted(cache.items()):
+            for result in ('hit', 'miss'):
+                lines.append(f'{METRICS_PREFIX}_cache_requests_total{{cache="{name}",result="{result}"}} '
+                             f'{counts[result]}')
+
+        lines += [f"# HELP {METRICS_PREFIX}_reruns_total Completed script reruns",
+                  f"# TYPE {METRICS_PREFIX}_reruns_total counter",
+                  f"{METRICS_PREFIX}_reruns_total {reruns}"]
+        if cold_start:
+            lines += [f"# HELP {METRICS_PREFIX}_cold_start_seconds First rerun of this process, in total and in imports",
+                      f"# TYPE {METRICS_PREFIX}_cold_start_seconds gauge"]
+            lines += [f'{METRICS_PREFIX}_cold_start_seconds{{part="{part.replace("_seconds", "")}"}} {value:.6f}'
+                      for part, value in cold_start.items()]
+        return "\n".join(lines) + "\n"
+
+
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+
+# ----------- SPANS -----------
+@contextmanager
+def span(name):
+    # Times a block into the process-wide stage stats and, inside a rerun, into its trace
+    trace = _active.get()
+    if trace is not None:
+        offset, depth = time.perf_counter() - trace.start, trace.depth
+        trace.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        get_metrics().observe(name, seconds)
+        if trace is not None:
+            trace.depth -= 1
+            trace.spans.append((name, offset, seconds, depth))
+
+def record_cache(name, hits=0, misses=0):
+    get_metrics().count_cache(name, hits, misses)
+    trace = _active.get()
+    if trace is not None:
+        trace.cache[name]['hit'] += hits
+        trace.cache[name]['miss'] += misses
+
+def import_module(name):
+    # Heavy modules are imported where they are first needed; the rerun that pays for it gets an import span
+    module = sys.modules.get(name)
+    if module is None:
+        with span(f"import {name}"):
+            module = importlib.import_module(name)
+    return module
+
+def start_rerun(page, **tags):
+    tags.setdefault('cold_start', get_metrics().reruns == 0)
+    trace = RerunTrace(page, tags=tags)
+    _active.set(trace)
+    return trace
+
+def finish_rerun(trace):
+    # Reruns cut short by st.stop() or st.rerun() are not recorded
+    trace.seconds = time.perf_counter() - trace.start
+    _active.set(None)
+    get_metrics().count_rerun(trace.seconds, trace.import_seconds)
+    if METRICS_LOG:
+        append_metrics_log(trace, METRICS_LOG)
+    return trace
+
+def append_metrics_log(trace, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        # One short append per line, so several server processes can share the file
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.as_dict(), default=str) + "\n")
+    except OSError as e:
+        logger.warning("Could not write metrics log %s: %s", path, e)
+
+
+# ----------- EXPORT -----------
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server(port=METRICS_PORT):
+    # One scrape endpoint per server process, next to Streamlit's own port
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+def render_debug_panel(trace, cache_info=None):
+    with st.expander("🛠️ Debug: Rerun Timings", expanded=True):
+        elapsed = (time.perf_counter() - trace.start) * 1000
+        st.caption(f"This rerun: {elapsed:.0f} ms so far, {trace.import_seconds * 1000:.0f} ms importing, "
+                   f"{len(trace.spans)} spans")
+        if trace.spans:
+            spans = pd.DataFrame(sorted(trace.spans, key=lambda s: s[1]),
+                                 columns=['Stage', 'Start (ms)', 'Duration (ms)', 'Depth'])
+            spans['Stage'] = ["· " * depth + name for name, depth in zip(spans['Stage'], spans['Depth'])]
+            spans[['Start (ms)', 'Duration (ms)']] *= 1000
+            st.dataframe(spans.drop(columns='Depth').round(1), hide_index=True, use_container_width=True)
+
+        metrics = get_metrics()
+        st.markdown("**All reruns in this process**")
+        if metrics.cold_start:
+            st.caption(f"Cold start: first rerun {metrics.cold_start['rerun_seconds'] * 1000:.0f} ms, "
+                       f"of which {metrics.cold_start['import_seconds'] * 1000:.0f} ms importing")
+        st.dataframe(metrics.stage_table().round(1), hide_index=True, use_container_width=True)
+        st.dataframe(metrics.cache_table().round(3), hide_index=True, use_container_width=True)
+        for name, info in (cache_info or {}).items():
+            st.caption(name)
+            st.json(info, expanded=False)
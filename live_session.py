@@ -0,0 +1,523 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from itertools import chain
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import streamlit as st
+from fastf1.core import Laps
+import session_store
+from comparison import COMPARISON_CHANNELS, DISTANCE_STEP, POSITION_CHANNELS, resample_laps, select_laps
+from degradation import fit_stint_degradation
+from narrative_generator import generate_narr
+from predictor import WEATHER_SCENARIOS, build_scenario_point, predict_grid
+from session_summary import summarize_session
+from telemetry import LAP_COLUMNS, TELEMETRY_PADDING, attach_position, extract_laps_telemetry
+
+REPLAY_CHUNK_SECONDS = 10  # car and position samples are recorded in chunks of this length
+# Live mode is off unless a feed directory is configured; the page only follows .jsonl files inside it
+LIVE_FEED_DIR = os.environ.get("F1_LIVE_FEED_DIR")
+FEED_READ_BYTES = 8 * 1024 * 1024  # most one poll reads, so a large backlog is caught up over several refreshes
+LIVE_SESSION_ENTRIES = 8
+
+
+# ----------- COLUMNAR BUFFERS -----------
+def _missing_value(dtype):
+    if dtype.kind in 'mM':
+        return np.datetime64('NaT') if dtype.kind == 'M' else np.timedelta64('NaT')
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'O':
+        return None
+    return 0
+
+class ColumnBuffer:
+    # Append-only columns that grow geometrically, so ingesting a message copies only its own rows
+    def __init__(self, capacity=1024):
+        self._columns = {}
+        self._size = 0
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def _new_column(self, dtype):
+        column = np.empty(self._capacity, dtype=dtype)
+        column[:self._size] = _missing_value(dtype)
+        return column
+
+    def _reserve(self, size):
+        if size <= self._capacity:
+            return
+        while self._capacity < size:
+            self._capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.empty(self._capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def append(self, frame):
+        start, end = self._size, self._size + len(frame)
+        if end == start:
+            return start, end
+        self._reserve(end)
+        for name in frame.columns:
+            values = frame[name].to_numpy()
+            if name not in self._columns:
+                self._columns[name] = self._new_column(values.dtype)
+            self._columns[name][start:end] = values
+        for name in set(self._columns) - set(frame.columns):
+            self._columns[name][start:end] = _missing_value(self._columns[name].dtype)
+        self._size = end
+        return start, end
+
+    def update(self, rows, frame):
+        for name in frame.columns:
+            if name not in self._columns:
+                self._columns[name] = self._new_column(frame[name].to_numpy().dtype)
+            self._columns[name][rows] = frame[name].to_numpy()
+
+    def column(self, name):
+        return self._columns[name][:self._size]
+
+    def frame(self, rows=None):
+        # Always a copy, so later in-place updates never leak into frames handed to the page
+        if rows is None:
+            rows = slice(0, self._size)
+        return pd.DataFrame({name: values[rows].copy() for name, values in self._columns.items()})
+
+    def time_slice(self, start, end, column='SessionTime'):
+        if not self._size:
+            return pd.DataFrame(columns=self.columns)
+        times = self.column(column)
+        lo = int(times.searchsorted(pd.Timedelta(start).to_timedelta64(), side='left'))
+        hi = int(times.searchsorted(pd.Timedelta(end).to_timedelta64(), side='right'))
+        return self.frame(slice(lo, hi))
+
+
+# ----------- REPLAY FILES -----------
+def encode_frame(frame):
+    # Column lists for JSON: timedeltas travel as integer nanoseconds and missing values as null
+    columns, timedeltas = {}, []
+    for name in frame.columns:
+        values = frame[name].to_numpy()
+        if values.dtype.kind == 'm':
+            timedeltas.append(name)
+            missing = np.isnat(values)
+            values = values.astype('timedelta64[ns]').view('int64')
+        else:
+            missing = pd.isna(values)
+            if values.dtype.kind in 'iub':
+                values = values.tolist()
+                columns[name] = values
+                continue
+        encoded = values.astype(object)
+        encoded[missing] = None
+        columns[name] = encoded.tolist()
+    return columns, timedeltas
+
+def _decode_column(values, timedelta=False):
+    if timedelta:
+        ns = np.array(values, dtype='float64')
+        missing = np.isnan(ns)
+        decoded = np.where(missing, 0, ns).astype('int64').view('timedelta64[ns]')
+        decoded[missing] = np.timedelta64('NaT')
+        return decoded
+    decoded = np.array(values)
+    if decoded.dtype.kind == 'U':
+        return decoded.astype(object)
+    if decoded.dtype == object:
+        # Numbers with gaps come back as float with NaN, the way pandas would read them
+        sample = next((value for value in values if value is not None), None)
+        if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+            return np.array(values, dtype='float64')
+    return decoded
+
+def decode_messages(messages):
+    # Consecutive messages of one kind and driver become a single frame
+    first = messages[0]
+    timedeltas = set(first.get('timedelta', []))
+    columns = {}
+    for name in first['columns']:
+        values = first['columns'][name] if len(messages) == 1 else \
+            list(chain.from_iterable(message['columns'][name] for message in messages))
+        columns[name] = _decode_column(values, name in timedeltas)
+    return pd.DataFrame(columns, copy=False)
+
+def _frame_messages(kind, frame, bounds, time_column, driver_code=None):
+    # One message per [start, end) row range, stamped with the SessionTime of its last row
+    columns, timedeltas = encode_frame(frame)
+    times = frame[time_column].to_numpy(dtype='timedelta64[ns]').view('int64')
+    drivers = columns.get('Driver')
+    return [{'kind': kind, 'time': int(times[end - 1]),
+             'driver': driver_code or (drivers[start] if drivers else None),
+             'columns': {name: values[start:end] for name, values in columns.items()},
+             'timedelta': timedeltas}
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+def _chunk_bounds(session_time):
+    seconds = session_time.to_numpy(dtype='timedelta64[ns]') / np.timedelta64(1, 's')
+    chunks = (seconds // REPLAY_CHUNK_SECONDS).astype('int64')
+    return np.flatnonzero(np.r_[True, chunks[1:] != chunks[:-1], True])
+
+def record_replay(year, circuit, racetype, path):
+    # Turns a stored session into the message stream a live feed would have produced, in SessionTime order
+    session_store.ensure_telemetry(year, circuit, racetype)
+    laps, results, total_laps, weather = session_store.read_session(year, circuit, racetype, LAP_COLUMNS)
+
+    laps = pd.DataFrame(laps)
+    laps = laps[laps['Time'].notna()].reset_index(drop=True)
+    messages = _frame_messages('laps', laps, np.arange(len(laps) + 1), 'Time')
+    for driver_code in laps['Driver'].unique():
+        for kind, columns in (('car_data', session_store.CAR_DATA_COLUMNS),
+                              ('pos_data', session_store.POS_DATA_COLUMNS)):
+            data = session_store.read_driver_table(year, circuit, racetype, kind, driver_code, columns)
+            if not data.empty:
+                messages.extend(_frame_messages(kind, data, _chunk_bounds(data['SessionTime']), 'SessionTime',
+                                                driver_code))
+    if weather is not None and not weather.empty:
+        messages.extend(_frame_messages('weather', weather, np.arange(len(weather) + 1), 'Time'))
+    messages.sort(key=lambda message: message['time'])
+
+    columns, timedeltas = encode_frame(results)
+    header = {'kind': 'session', 'time': 0, 'driver': None, 'columns': columns, 'timedelta': timedeltas,
+              'year': int(year), 'circuit': circuit, 'session': racetype, 'total_laps': total_laps}
+    with open(path, "w", encoding="utf-8") as f:
+        for message in [header] + messages:
+            f.write(json.dumps(message, separators=(",", ":"), default=str) + "\n")
+    return len(messages) + 1
+
+def list_live_feeds(feed_dir=LIVE_FEED_DIR):
+    if not feed_dir or not os.path.isdir(feed_dir):
+        return []
+    return sorted(name for name in os.listdir(feed_dir)
+                  if name.endswith(".jsonl") and os.path.isfile(os.path.join(feed_dir, name)))
+
+def feed_path(name, feed_dir=LIVE_FEED_DIR):
+    # Feeds are named relative to the feed directory; anything that resolves outside it is refused
+    if not feed_dir:
+        raise ValueError("Live mode is off: set F1_LIVE_FEED_DIR to the directory live feeds are written to")
+    root = os.path.realpath(feed_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root or not path.endswith(".jsonl"):
+        raise ValueError(f"{name} is not a feed in {feed_dir}")
+    return path
+
+class ReplayFeed:
+    # Tails a JSONL message file. With a speed it replays a recording at that multiple of real time,
+    # otherwise it returns whatever has been written so far, which is how a recorder feeding a live session works.
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+        self.malformed = 0  # lines skipped because they were not feed messages
+        self.last_error = None
+        self._offset = 0
+        self._skipping = False  # inside a line longer than one read, dropped up to its newline
+        self._lines = deque()  # read but not yet delivered, parsed only when their turn comes
+        self._started = None
+
+    def _skip(self, error):
+        self.malformed += 1
+        self.last_error = error
+
+    def _read_new_lines(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(FEED_READ_BYTES)
+        start = 0
+        if self._skipping:
+            start = data.find(b"\n") + 1
+            if not start:
+                self._offset += len(data)
+                return
+            self._skipping = False
+        # A half-written last line is left for the next poll, unless it fills a whole read on its own
+        end = data.rfind(b"\n") + 1
+        if not end and len(data) == FEED_READ_BYTES:
+            self._skip(f"line longer than {FEED_READ_BYTES:,} bytes")
+            self._skipping = True
+            self._offset += len(data)
+            return
+        self._offset += end
+        self._lines.extend(line for line in data[start:end].splitlines() if line.strip())
+
+    def _parse(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            self._skip(f"not JSON ({e})")
+            return None
+        if not (isinstance(message, dict) and isinstance(message.get('time'), int)
+                and isinstance(message.get('columns'), dict) and 'kind' in message):
+            self._skip("not a feed message")
+            return None
+        return message
+
+    def replay_time(self):
+        if not self.speed:
+            return None
+        if self._started is None:
+            self._started = time.monotonic()
+        return pd.Timedelta(seconds=(time.monotonic() - self._started) * self.speed)
+
+    def poll(self, until=None):
+        # Messages are in SessionTime order, so parsing stops at the first one past the cutoff
+        self._read_new_lines()
+        until = until if until is not None else self.replay_time()
+        cutoff = pd.Timedelta(until).value if until is not None else None
+        messages = []
+        while self._lines:
+            message = self._lines[0] if isinstance(self._lines[0], dict) else self._parse(self._lines[0])
+            if message is None:
+                self._lines.popleft()
+                continue
+            if cutoff is not None and message['time'] > cutoff:
+                self._lines[0] = message
+                break
+            self._lines.popleft()
+            messages.append(message)
+        return messages
+
+
+# ----------- LIVE SESSION -----------
+@dataclass
+class LiveUpdate:
+    messages: int = 0
+    new_laps: int = 0
+    changed_laps: dict = field(default_factory=dict)  # driver -> lap numbers whose rows or telemetry changed
+    seconds: float = 0.0
+    malformed: int = 0  # feed lines skipped this refresh
+
+    @property
+    def changed_drivers(self):
+        return sorted(self.changed_laps)
+
+class LiveSession:
+    # Laps, car data and weather accumulate in columnar buffers; every derived view is cached per driver
+    # and only the drivers with changed laps are recomputed on a refresh.
+    def __init__(self, feed):
+        self.feed = feed
+        self.info = {}
+        self.results = pd.DataFrame()
+        self._laps = ColumnBuffer()
+        self._lap_rows = {}  # (driver, lap number) -> buffer row
+        self._telemetry = {'car_data': defaultdict(ColumnBuffer), 'pos_data': defaultdict(ColumnBuffer)}
+        self._weather = ColumnBuffer(capacity=256)
+        self._lock = threading.Lock()
+
+        self.laps = Laps(pd.DataFrame(columns=LAP_COLUMNS))
+        self.summary = pd.DataFrame()
+        self.stints = pd.DataFrame()
+        self.degradation = pd.DataFrame()
+        self._lap_telemetry = {}  # (driver, lap number) -> extracted lap frame
+        # Separate from _lock, which refresh() already holds when it re-extracts telemetry
+        self._lap_telemetry_lock = threading.Lock()
+        self._narratives = {}
+        self._predictions = {}
+        self._prediction_model = None
+        self._views_lock = threading.Lock()  # narratives and predictions, filled by any tab and cleared by refresh()
+
+    @property
+    def total_laps(self):
+        if self.info.get('total_laps'):
+            return self.info['total_laps']
+        return int(self.laps['LapNumber'].max()) if not self.laps.empty else 1
+
+    @property
+    def weather(self):
+        return self._weather.frame()
+
+    def session_data(self):
+        # Same shape as telemetry.load_session_data
+        return self.laps, self.results, self.total_laps, self.weather
+
+    # ----- ingest -----
+    def _ingest_laps(self, frame, changed):
+        rows = [self._lap_rows.get((driver_code, lap_number))
+                for driver_code, lap_number in zip(frame['Driver'], frame['LapNumber'])]
+        revised = np.array([row is not None for row in rows], dtype=bool)
+        if revised.any():
+            self._laps.update(np.array([row for row in rows if row is not None]), frame[revised])
+        if not revised.all():
+            new = frame[~revised]
+            start, _ = self._laps.append(new)
+            for offset, key in enumerate(zip(new['Driver'], new['LapNumber'])):
+                self._lap_rows[key] = start + offset
+        for driver_code, lap_number in zip(frame['Driver'], frame['LapNumber']):
+            changed[driver_code].add(lap_number)
+        return int((~revised).sum())
+
+    def _ingest_telemetry(self, kind, driver_code, frame, changed):
+        self._telemetry[kind][driver_code].append(frame)
+        if not len(self._laps):
+            return
+        # Laps whose padded window reaches the new samples get their telemetry re-extracted
+        first = frame['SessionTime'].min() - TELEMETRY_PADDING
+        drivers = self._laps.column('Driver')
+        ends = self._laps.column('Time')
+        touched = (drivers == driver_code) & (ends >= first.to_timedelta64())
+        changed[driver_code].update(self._laps.column('LapNumber')[touched].tolist())
+
+    def ingest(self, messages):
+        changed = defaultdict(set)
+        new_laps = 0
+        batches = defaultdict(list)
+        for message in messages:
+            if message['kind'] == 'session':
+                self.info = {key: message.get(key) for key in ('year', 'circuit', 'session', 'total_laps')}
+                self.results = decode_messages([message])
+            else:
+                batches[(message['kind'], message['driver'])].append(message)
+
+        # Laps go first so new telemetry can be matched to the laps it belongs to
+        for (kind, driver_code), batch in sorted(batches.items(), key=lambda item: item[0][0] != 'laps'):
+            frame = decode_messages(batch)
+            if kind == 'laps':
+                new_laps += self._ingest_laps(frame.drop_duplicates(['Driver', 'LapNumber'], keep='last'), changed)
+            elif kind in self._telemetry:
+                self._ingest_telemetry(kind, driver_code, frame, changed)
+            elif kind == 'weather':
+                self._weather.append(frame)
+        return changed, new_laps
+
+    # ----- incremental recompute -----
+    def _replace_rows(self, table, rows, changed_drivers, by_index=False):
+        keys = table.index if by_index else table.get('Driver', pd.Series(dtype=object))
+        kept = table[~np.asarray(keys.isin(changed_drivers), dtype=bool)] if not table.empty else table
+        if rows is None or rows.empty:
+            return kept
+        combined = pd.concat([kept, rows]) if not kept.empty else rows
+        return combined.sort_index() if by_index else \
+            combined.sort_values(['Driver'] + [col for col in ('Stint',) if col in combined]).reset_index(drop=True)
+
+    def _recompute(self, changed):
+        self.laps = Laps(self._laps.frame())
+        drivers = sorted(changed)
+        for driver_code, lap_numbers in changed.items():
+            with self._lap_telemetry_lock:
+                for lap_number in lap_numbers:
+                    self._lap_telemetry.pop((driver_code, lap_number), None)
+            with self._views_lock:
+                self._narratives.pop(driver_code, None)
+                self._predictions.pop(driver_code, None)
+
+        driver_laps = self.laps[self.laps['Driver'].isin(drivers)]
+        results = self.results
+        if not results.empty and 'Abbreviation' in results.columns:
+            results = results[results['Abbreviation'].isin(drivers)]
+        telemetry_loader = lambda driver_code: self.lap_telemetry(
+            driver_code, driver_laps.pick_drivers(driver_code).pick_quicklaps())
+        summary, stints = summarize_session(driver_laps, results, telemetry_loader)
+        self.summary = self._replace_rows(self.summary, summary, drivers, by_index=True)
+        self.stints = self._replace_rows(self.stints, stints, drivers)
+        self.degradation = self._replace_rows(self.degradation, fit_stint_degradation(driver_laps, self.total_laps),
+                                              drivers)
+
+    def refresh(self, until=None):
+        with self._lock:
+            start = time.perf_counter()
+            malformed = self.feed.malformed
+            messages = self.feed.poll(until)
+            changed, new_laps = self.ingest(messages)
+            if changed:
+                self._recompute(changed)
+            return LiveUpdate(messages=len(messages), new_laps=new_laps,
+                              changed_laps={driver: sorted(laps) for driver, laps in changed.items()},
+                              seconds=time.perf_counter() - start, malformed=self.feed.malformed - malformed)
+
+    # ----- per-driver views -----
+    def lap_telemetry(self, driver_code, laps, position=False):
+        # Completed laps are extracted once; a lap is only re-extracted when new samples reach it
+        laps = laps[laps['LapStartTime'].notna() & laps['Time'].notna()]
+        if laps.empty:
+            return pd.DataFrame()
+        # The session is shared by every browser session: one check-then-fill at a time, so a lap is built once
+        with self._lap_telemetry_lock:
+            missing = laps[[(driver_code, lap_number) not in self._lap_telemetry or
+                            (position and 'X' not in self._lap_telemetry[(driver_code, lap_number)].columns)
+                            for lap_number in laps['LapNumber']]]
+            if not missing.empty:
+                window = (missing['LapStartTime'].min() - TELEMETRY_PADDING, missing['Time'].max() + TELEMETRY_PADDING)
+                telemetry = extract_laps_telemetry(self._telemetry['car_data'][driver_code].time_slice(*window), missing)
+                if position:
+                    telemetry = attach_position(telemetry, self._telemetry['pos_data'][driver_code].time_slice(*window))
+                for lap_number, frame in telemetry.groupby('LapNumber', sort=False) if not telemetry.empty else []:
+                    self._lap_telemetry[(driver_code, lap_number)] = frame.reset_index(drop=True)
+
+            frames = [self._lap_telemetry[(driver_code, lap_number)] for lap_number in laps['LapNumber']
+                      if (driver_code, lap_number) in self._lap_telemetry]
+        if not frames:
+            return pd.DataFrame()
+        telemetry = pd.concat(frames, ignore_index=True)
+        if not position and 'X' in telemetry.columns:
+            telemetry = telemetry.drop(columns=['X', 'Y', 'Z'])
+        telemetry['Compound'] = telemetry['Compound'].astype('category')
+        return telemetry
+
+    def narrative(self, driver_summary, circuit_name, session_type):
+        key = driver_summary.driver_code
+        with self._views_lock:
+            if key not in self._narratives:
+                self._narratives[key] = generate_narr(driver_summary, circuit_name, session_type)
+            return self._narratives[key]
+
+    def compare_laps(self, drivers, lap_numbers=None, position=False, step=DISTANCE_STEP):
+        laps = select_laps(self.laps, drivers, lap_numbers)
+        if laps.empty:
+            return None
+        frames = [(driver_code, self.lap_telemetry(driver_code, driver_laps, position))
+                  for driver_code, driver_laps in laps.groupby('Driver', sort=False)]
+        channels = COMPARISON_CHANNELS + (POSITION_CHANNELS if position else [])
+        return resample_laps([frame for frame in frames if not frame[1].empty], step, channels)
+
+    def next_lap_predictions(self, loaded_model, year, weather=WEATHER_SCENARIOS[0]):
+        # Each driver's next lap on the current tyres; only drivers with new laps are predicted again
+        laps = self.laps[self.laps['LapNumber'].notna() & self.laps['TyreLife'].notna()]
+        if laps.empty:
+            return pd.DataFrame()
+        latest = laps.sort_values('LapNumber').groupby('Driver').tail(1).set_index('Driver')
+        weather_data = self.weather
+        with self._views_lock:
+            if loaded_model is not self._prediction_model:
+                self._predictions, self._prediction_model = {}, loaded_model
+            for driver_code, lap in latest.iterrows():
+                if driver_code in self._predictions:
+                    continue
+                grid = build_scenario_point(int(lap['LapNumber']) + 1, int(lap['TyreLife']) + 1, lap['Compound'],
+                                            weather)
+                stint = int(lap['Stint']) if pd.notnull(lap['Stint']) else 1
+                prediction = predict_grid(loaded_model, grid, weather_data, year, driver_code, stint)
+                self._predictions[driver_code] = prediction.assign(Driver=driver_code)
+            # A snapshot, so a refresh clearing entries can't change the dict while it is concatenated
+            predictions = list(self._predictions.values())
+        if not predictions:
+            return pd.DataFrame()
+        return pd.concat(predictions, ignore_index=True)
+
+@st.cache_resource(show_spinner=False, max_entries=LIVE_SESSION_ENTRIES)
+def get_live_session(name, speed=None):
+    # One live session per feed, shared by every browser tab following it
+    return LiveSession(ReplayFeed(feed_path(name), speed or None))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a stored session as a live-feed replay file.")
+    parser.add_argument("year", type=int)
+    parser.add_argument("circuit")
+    parser.add_argument("session")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = record_replay(args.year, args.circuit, args.session, args.path)
+    print(f"✅ {count:,} messages written to {args.path} ({time.perf_counter() - start:.1f}s)")
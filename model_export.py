@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from model_registry import MODELS_DIR, MODEL_SUFFIX, model_features
+from tree_scorer import COMPILED_SUFFIX, MISSING_NONE, MISSING_ZERO, MISSING_NAN, CompiledModel
+
+COMPILED_DIR = os.path.join(MODELS_DIR, "compiled")
+TOLERANCE = 1e-3  # seconds
+
+LGBM_MISSING_TYPES = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+
+
+def _empty_nodes():
+    return {'feature': [], 'threshold': [], 'left': [], 'right': [], 'default_left': [],
+            'missing_type': [], 'value': []}
+
+def _export_xgboost(model):
+    config = json.loads(model.get_booster().save_raw(raw_format='json'))
+    learner = config['learner']
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+
+    nodes, roots = _empty_nodes(), []
+    for tree in learner['gradient_booster']['model']['trees']:
+        offset = len(nodes['feature'])
+        left = np.asarray(tree['left_children'])
+        right = np.asarray(tree['right_children'])
+        is_leaf = left < 0
+
+        roots.append(offset)
+        nodes['feature'].extend(np.where(is_leaf, -1, tree['split_indices']))
+        nodes['threshold'].extend(tree['split_conditions'])
+        nodes['left'].extend(np.where(is_leaf, -1, left + offset))
+        nodes['right'].extend(np.where(is_leaf, -1, right + offset))
+        nodes['default_left'].extend(np.asarray(tree['default_left'], dtype=bool))
+        nodes['missing_type'].extend([MISSING_NAN] * len(left))
+        # Leaf values live in split_conditions for leaf nodes
+        nodes['value'].extend(np.where(is_leaf, tree['split_conditions'], 0.0))
+    return 'xgboost', base_score, nodes, roots
+
+def _export_lightgbm(model):
+    dump = model.booster_.dump_model()
+    nodes, roots = _empty_nodes(), []
+
+    def add(node):
+        index = len(nodes['feature'])
+        for key in nodes:
+            nodes[key].append(0)
+        if 'leaf_value' in node:
+            nodes['feature'][index] = -1
+            nodes['left'][index] = nodes['right'][index] = -1
+            nodes['value'][index] = node['leaf_value']
+            return index
+        nodes['feature'][index] = node['split_feature']
+        nodes['threshold'][index] = node['threshold']
+        nodes['default_left'][index] = node['default_left']
+        nodes['missing_type'][index] = LGBM_MISSING_TYPES[node['missing_type']]
+        nodes['left'][index] = add(node['left_child'])
+        nodes['right'][index] = add(node['right_child'])
+        return index
+
+    for tree in dump['tree_info']:
+        roots.append(add(tree['tree_structure']))
+    return 'lightgbm', 0.0, nodes, roots
+
+def export_model(model):
+    if hasattr(model, 'get_booster'):
+        kind, base_score, nodes, roots = _export_xgboost(model)
+    else:
+        kind, base_score, nodes, roots = _export_lightgbm(model)
+
+    return {
+        'kind': np.array(kind),
+        'features': np.array(model_features(model)),
+        'base_score': np.array(base_score),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'feature': np.asarray(nodes['feature'], dtype=np.int32),
+        'threshold': np.asarray(nodes['threshold'], dtype=np.float64),
+        'left': np.asarray(nodes['left'], dtype=np.int32),
+        'right': np.asarray(nodes['right'], dtype=np.int32),
+        'default_left': np.asarray(nodes['default_left'], dtype=bool),
+        'missing_type': np.asarray(nodes['missing_type'], dtype=np.int8),
+        'value': np.asarray(nodes['value'], dtype=np.float64)
+    }
+
+def validation_matrix(arrays, n_rows=2000, seed=42):
+    # Sample each feature around the model's own split points so every branch gets exercised
+    rng = np.random.default_rng(seed)
+    n_features = len(arrays['features'])
+    X = np.zeros((n_rows, n_features))
+    for f in range(n_features):
+        thresholds = arrays['threshold'][arrays['feature'] == f]
+        if len(thresholds):
+            X[:, f] = rng.choice(thresholds, n_rows) + rng.choice([-1e-3, 0.0, 1e-3], n_rows)
+    X[rng.random(X.shape) < 0.01] = np.nan
+    return X
+
+def check_model(model, compiled, X):
+    expected = model.predict(pd.DataFrame(X, columns=compiled.features))
+    return float(np.max(np.abs(compiled.predict(X) - expected)))
+
+def export_all(models_dir=MODELS_DIR, out_dir=COMPILED_DIR, check=True):
+    os.makedirs(out_dir, exist_ok=True)
+    for filename in sorted(os.listdir(models_dir)):
+        if not filename.endswith(MODEL_SUFFIX):
+            continue
+        name = filename[:-len(MODEL_SUFFIX)]
+        model = joblib.load(os.path.join(models_dir, filename))
+        arrays = export_model(model)
+        out_path = os.path.join(out_dir, f"{name}{COMPILED_SUFFIX}")
+        np.savez_compressed(out_path, **arrays)
+
+        message = f"✅ {name}: {len(arrays['roots'])} trees, {len(arrays['feature'])} nodes, " \
+                  f"{os.path.getsize(out_path) / 1024:.0f} KB"
+        if check:
+            error = check_model(model, CompiledModel(arrays), validation_matrix(arrays))
+            if error > TOLERANCE:
+                os.remove(out_path)
+                print(f"❌ {name}: max error {error:.2e}s exceeds {TOLERANCE}s, not exported")
+                continue
+            message += f", max error {error:.1e}s"
+        print(message)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export circuit models to NumPy tree arrays.")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--out-dir", default=COMPILED_DIR)
+    parser.add_argument("--no-check", action="store_true", help="Skip comparing against the original model")
+    args = parser.parse_args()
+
+    export_all(args.models_dir, args.out_dir, check=not args.no_check)
@@ -0,0 +1,160 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import streamlit as st
+from config import LOCATION_TO_EVENT_NAME_MAP
+from instrumentation import record_cache
+from tree_scorer import COMPILED_SUFFIX, load_compiled_model
+
+MODELS_DIR = "models"
+MODEL_SUFFIX = "_model.joblib"
+DEFAULT_CACHE_MB = int(os.environ.get("F1_MODEL_CACHE_MB", 64))
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    path: str
+    model: object
+    features: list
+    column_index: dict
+    size_bytes: int
+    load_seconds: float
+
+
+@dataclass
+class RegistryStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    load_seconds: dict = field(default_factory=dict)
+
+    def as_dict(self):
+        total_loads = sum(len(times) for times in self.load_seconds.values())
+        total_seconds = sum(sum(times) for times in self.load_seconds.values())
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / (self.hits + self.misses) if (self.hits + self.misses) else 0.0,
+            'loads': total_loads,
+            'total_load_seconds': total_seconds,
+            'load_seconds': {name: list(times) for name, times in self.load_seconds.items()}
+        }
+
+
+def safe_model_name(event_name):
+    return re.sub(r'[\\/*?:"<>|]', "", event_name).replace(" ", "_")
+
+def model_features(model):
+    # XGBoost keeps feature names on the booster, LightGBM on the estimator
+    if hasattr(model, 'get_booster'):
+        return list(model.get_booster().feature_names)
+    return list(model.feature_name_)
+
+
+class ModelRegistry:
+    def __init__(self, models_dir=MODELS_DIR, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024, use_compiled=True):
+        self.models_dir = models_dir
+        self.compiled_dir = os.path.join(models_dir, "compiled") if use_compiled else None
+        self.max_bytes = max_bytes
+        self.stats = RegistryStats()
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self._cached_bytes = 0
+        self._index = self._build_index()
+
+    def _build_index(self):
+        index = {}
+        # Compiled tree arrays take precedence over the joblib pickles
+        for directory, suffix in ((self.models_dir, MODEL_SUFFIX), (self.compiled_dir, COMPILED_SUFFIX)):
+            if directory is None or not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if filename.endswith(suffix):
+                    index[filename[:-len(suffix)]] = os.path.join(directory, filename)
+        return index
+
+    def available(self):
+        return sorted(self._index)
+
+    def resolve(self, circuit):
+        event_name = LOCATION_TO_EVENT_NAME_MAP.get(circuit, circuit)
+        name = safe_model_name(event_name)
+        if name not in self._index:
+            raise FileNotFoundError(f"No model for {circuit} ({event_name}) in {self.models_dir}")
+        return name
+
+    def get(self, circuit):
+        name = self.resolve(circuit)
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                self.stats.hits += 1
+                record_cache('models', hits=1)
+                return self._loaded[name]
+            self.stats.misses += 1
+        record_cache('models', misses=1)
+
+        loaded = self._load(name)
+
+        with self._lock:
+            if name not in self._loaded:
+                self._loaded[name] = loaded
+                self._cached_bytes += loaded.size_bytes
+                self._evict()
+            return self._loaded.get(name, loaded)
+
+    def _load(self, name):
+        path = self._index[name]
+        start = time.perf_counter()
+        if path.endswith(COMPILED_SUFFIX):
+            model = load_compiled_model(path)
+            features = model.features
+            size_bytes = model.nbytes
+        else:
+            # Only models without a compiled copy need joblib (and XGBoost or LightGBM behind it)
+            import joblib
+            model = joblib.load(path)
+            features = model_features(model)
+            size_bytes = os.path.getsize(path)
+        load_seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.stats.load_seconds.setdefault(name, []).append(load_seconds)
+        return LoadedModel(
+            name=name,
+            path=path,
+            model=model,
+            features=features,
+            column_index={feature: i for i, feature in enumerate(features)},
+            size_bytes=size_bytes,
+            load_seconds=load_seconds
+        )
+
+    def _evict(self):
+        # Always keep the most recently used model, even if it alone exceeds the budget
+        while self._cached_bytes > self.max_bytes and len(self._loaded) > 1:
+            _, evicted = self._loaded.popitem(last=False)
+            self._cached_bytes -= evicted.size_bytes
+            self.stats.evictions += 1
+
+    def cache_info(self):
+        with self._lock:
+            info = self.stats.as_dict()
+            info.update({
+                'cached_models': list(self._loaded),
+                'cached_bytes': self._cached_bytes,
+                'max_bytes': self.max_bytes,
+                'indexed_models': len(self._index)
+            })
+            return info
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry():
+    # One registry per server process, shared by every Streamlit session
+    return ModelRegistry()
@@ -1,34 +1,22 @@
-from datetime import timedelta
 from config import DRIVERS_2024
 import pandas as pd
 
-def generate_narr(driver_laps_df, driver_code, circuit_name, session_type):
-    driver_name = DRIVERS_2024.get(driver_code, "Unknown")
+def generate_narr(summary, circuit_name, session_type):
+    driver_name = DRIVERS_2024.get(summary.driver_code, "Unknown")
     
-    if driver_laps_df.empty:
+    if not summary.has_laps:
         return f"<h3>Analysis for {driver_name}</h3><p>No valid lap data was found for {driver_name} in the {session_type} at {circuit_name}. They may not have set a representative lap time.</p>", ""
 
-    # Fastest Lap
-    fastest_lap_row = driver_laps_df.loc[driver_laps_df['LapTime'].idxmin()]
-    fastest_lap_time = fastest_lap_row['LapTime']
-    fastest_lap_number = int(fastest_lap_row['LapNumber'])
-    compound = fastest_lap_row['Compound']
-    avg_speed = fastest_lap_row[['SpeedFL', 'SpeedST', 'SpeedI1', 'SpeedI2']].mean(skipna=True)
+    fastest_lap_time = summary.fastest_lap_time
+    fastest_lap_number = summary.fastest_lap_number
+    compound = summary.fastest_lap_compound
+    avg_speed = summary.fastest_lap_avg_speed
+    longest_stint_length = summary.longest_stint_length
+    longest_stint_compound = summary.longest_stint_compound
 
-    # Longest Stint
-    stint_lengths = driver_laps_df.groupby('Stint')['LapNumber'].count()
-    longest_stint = stint_lengths.idxmax()
-    longest_stint_length = stint_lengths.max()
-    longest_stint_compound = driver_laps_df[driver_laps_df['Stint'] == longest_stint]['Compound'].mode().iloc[0]
-
-    # Sector Performance
-    best_s1 = driver_laps_df['Sector1Time'].min()
-    best_s2 = driver_laps_df['Sector2Time'].min()
-    best_s3 = driver_laps_df['Sector3Time'].min()
-
-    s1 = best_s1.total_seconds() if pd.notnull(best_s1) else "N/A"
-    s2 = best_s2.total_seconds() if pd.notnull(best_s2) else "N/A"
-    s3 = best_s3.total_seconds() if pd.notnull(best_s3) else "N/A"
+    s1 = summary.best_s1.total_seconds() if pd.notnull(summary.best_s1) else "N/A"
+    s2 = summary.best_s2.total_seconds() if pd.notnull(summary.best_s2) else "N/A"
+    s3 = summary.best_s3.total_seconds() if pd.notnull(summary.best_s3) else "N/A"
 
     # Build narrative
     narrative = f"""
@@ -49,31 +37,20 @@ def generate_narr(driver_laps_df, driver_code, circuit_name, session_type):
     """
     return narrative, sector
 
-def generate_nerd_stats(lap_df, telemetry_df, driver_code, circuit_name, session_type):
-    driver_name = DRIVERS_2024.get(driver_code, "Unknown")
+def generate_nerd_stats(summary, circuit_name, session_type):
+    driver_name = DRIVERS_2024.get(summary.driver_code, "Unknown")
 
-    if lap_df.empty or telemetry_df.empty:
+    if not summary.has_laps or not summary.has_telemetry:
         return f"<h4>Stats for Nerds</h4><p>No detailed telemetry or lap data found for {driver_name}.</p>"
 
-    total_time = lap_df['LapTime'].sum()
-    total_distance = telemetry_df['Distance'].max()
-    avg_gear_shifts = telemetry_df.groupby('LapNumber')['nGear'].apply(lambda g: g.diff().fillna(0).ne(0).sum()).mean()
-    top_speed = telemetry_df['Speed'].max()
-    drs_laps = telemetry_df[telemetry_df['DRS'] >= 10]['LapNumber'].nunique() # DRS value is usually > 8
-
-    sectors = ['Sector1Time', 'Sector2Time', 'Sector3Time']
-    sector_names = ['Sector 1', 'Sector 2', 'Sector 3']
-    best_sector = None
-    best_sector_time = float('inf')
-    best_sector_lap = None
-    for sector in sectors:
-        if lap_df[sector].notnull().any():
-            min_val = lap_df[sector].min().total_seconds()
-            lap_num = lap_df[lap_df[sector] == lap_df[sector].min()]['LapNumber'].iloc[0]
-            if min_val < best_sector_time:
-                best_sector_time = min_val
-                best_sector_lap = lap_num
-                best_sector = sector_names[sectors.index(sector)]
+    total_time = summary.total_time
+    total_distance = summary.total_distance
+    avg_gear_shifts = summary.avg_gear_shifts
+    top_speed = summary.top_speed
+    drs_laps = summary.drs_laps
+    best_sector = summary.best_sector
+    best_sector_time = summary.best_sector_time
+    best_sector_lap = summary.best_sector_lap
 
     # Wrap values in red span
     def red(val): return f"<span style='color:#e10600;'><strong>{val}</strong></span>"
@@ -1,71 +1,165 @@
 import plotly.graph_objects as go
-import plotly.express as px
+from plotly.colors import qualitative
+from plotly.subplots import make_subplots
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib import colormaps
-from matplotlib.collections import LineCollection
+from config import TELEMETRY_MAX_POINTS
 
 
-def generate_telemetry_plots(lap_telemetry):
+# (column, title, axis label, colour, step-shaped)
+TELEMETRY_CHANNELS = [
+    ('Speed', 'Speed Trace', 'Speed (Km/h)', '#FF1801', False),
+    ('Throttle', 'Throttle Application', 'Throttle (%)', '#00D2BE', False),
+    ('Brake', 'Braking Points', 'Brake Applied', '#E10600', True),
+    ('RPM', 'Engine RPM', 'RPM', '#ff4c4c', False),
+    ('nGear', 'Gear Shifts', 'Gear', '#ff7f7f', True)
+]
+
+COMPOUND_COLORS = {
+    'SOFT': '#FF3333',
+    'MEDIUM': '#FFF200',
+    'HARD': '#F0F0F0',
+    'INTERMEDIATE': '#44D744',
+    'WET': '#2772FF'
+}
+
+def lttb_indices(x, y, max_points):
+    # Largest-Triangle-Three-Buckets: keeps the points that best preserve the trace's shape
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:edges[i + 2]].mean(), y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[anchor] - next_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (next_y - y[anchor]))
+        anchor = start + int(np.argmax(area)) if end > start else start
+        selected[i + 1] = anchor
+    return np.unique(selected)
+
+def minmax_indices(y, max_points):
+    # Keeps the min and max of every bucket, so spikes and steps survive downsampling
+    n = len(y)
+    if max_points >= n or max_points < 4:
+        return np.arange(n)
+
+    buckets = np.arange(n) * ((max_points - 2) // 2) // n
+    order = np.lexsort((y, buckets))
+    bucket_starts = np.searchsorted(buckets[order], np.unique(buckets), side='left')
+    bucket_ends = np.append(bucket_starts[1:], n) - 1
+    return np.unique(np.concatenate(([0, n - 1], order[bucket_starts], order[bucket_ends])))
+
+def downsample(x, y, max_points, method='lttb'):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if not max_points:
+        return x, y
+    idx = lttb_indices(x, y, max_points) if method == 'lttb' else minmax_indices(y, max_points)
+    return x[idx], y[idx]
+
+def _telemetry_trace(lap_telemetry, column, colour, step, max_points, method, webgl):
+    scatter = go.Scattergl if webgl else go.Scatter
+    # Step channels (brake, gear) always use min/max buckets so no transition is dropped
+    x, y = downsample(lap_telemetry['Distance'], lap_telemetry[column].astype(float), max_points,
+                      'minmax' if step else method)
+    line = dict(color=colour, shape='hv') if column == 'nGear' else dict(color=colour)
+    return scatter(x=x, y=y, mode='lines', name=column, line=line,
+                   fill='tozeroy' if column == 'Brake' else None)
+
+def generate_telemetry_figure(lap_telemetry, max_points=TELEMETRY_MAX_POINTS, method='lttb', webgl=True):
     if lap_telemetry.empty:
-        return None, None, None
+        return None
 
-    template = "plotly_dark"
-    
-    # 1. SPEED PLOT
-    fig_speed = go.Figure()
-    fig_speed.add_trace(go.Scatter(x=lap_telemetry['Distance'], y=lap_telemetry['Speed'],
-                                   mode='lines', name='Speed', line=dict(color='#FF1801')))
-    fig_speed.update_layout(title="Speed Trace", xaxis_title="Distance (m)",
-                            yaxis_title="Speed (Km/h)", template=template)
-
-    # 2. THROTTLE PLOT
-    fig_throttle = go.Figure()
-    fig_throttle.add_trace(go.Scatter(x=lap_telemetry['Distance'], y=lap_telemetry['Throttle'],
-                                      mode='lines', name='Throttle', line=dict(color='#00D2BE')))
-    fig_throttle.update_layout(title="Throttle Application", xaxis_title="Distance (m)",
-                               yaxis_title="Throttle (%)", template=template)
-
-    # 3. BRAKE PLOT
-    fig_brake = go.Figure()
-    fig_brake.add_trace(go.Scatter(x=lap_telemetry['Distance'], y=lap_telemetry['Brake'].astype(int),
-                                   mode='lines', name='Brake', line=dict(color='#E10600'), fill='tozeroy'))
-    fig_brake.update_layout(title="Braking Points", xaxis_title="Distance (m)",
-                            yaxis_title="Brake Applied", template=template)
-    
-    # 4. RPM PLOT
-    fig_rpm = go.Figure()
-    fig_rpm.add_trace(go.Scatter(x=lap_telemetry['Distance'], y=lap_telemetry['RPM'], mode = 'lines',name='RPM',line=dict(color='#ff4c4c')))
-    fig_rpm.update_layout(title='Engine RPM',xaxis_title='Distance (m)',yaxis_title='RPM',template = template)
-
-    # 5. GEAR PLOT
-    fig_gear = go.Figure()
-    fig_gear.add_trace(go.Scatter(x=lap_telemetry['Distance'], y=lap_telemetry['nGear'],
-                                   mode='lines', name='Gear', line=dict(color='#ff7f7f', shape='hv')))
-    fig_gear.update_layout(title="Gear Shifts", xaxis_title="Distance (m)",
-                            yaxis_title="Gear", template=template, yaxis=dict(tickmode='linear', dtick=1))
-
-    return fig_speed, fig_throttle, fig_brake, fig_rpm, fig_gear 
-
-def generate_strategy_plot(driver_laps):
-    if driver_laps.empty:
+    fig = make_subplots(rows=len(TELEMETRY_CHANNELS), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        subplot_titles=[title for _, title, _, _, _ in TELEMETRY_CHANNELS],
+                        row_heights=[0.3, 0.175, 0.175, 0.175, 0.175])
+    for row, (column, _, label, colour, step) in enumerate(TELEMETRY_CHANNELS, start=1):
+        fig.add_trace(_telemetry_trace(lap_telemetry, column, colour, step, max_points, method, webgl), row=row, col=1)
+        fig.update_yaxes(title_text=label, row=row, col=1)
+    fig.update_yaxes(tickmode='linear', dtick=1, row=len(TELEMETRY_CHANNELS), col=1)
+    fig.update_xaxes(title_text="Distance (m)", row=len(TELEMETRY_CHANNELS), col=1)
+    fig.update_layout(height=1100, template="plotly_dark", showlegend=False, hovermode='x unified')
+    return fig
+
+# (channel, axis label, step-shaped) rows of the comparison figure, below the delta trace
+COMPARISON_ROWS = [
+    ('Speed', 'Speed (Km/h)', False),
+    ('Throttle', 'Throttle (%)', False),
+    ('Brake', 'Brake', True),
+    ('nGear', 'Gear', True)
+]
+
+def generate_comparison_figure(comparison, max_points=TELEMETRY_MAX_POINTS, webgl=True):
+    if comparison is None or not len(comparison.distance):
+        return None
+
+    rows = [row for row in COMPARISON_ROWS if row[0] in comparison.channels]
+    fig = make_subplots(rows=len(rows) + 1, cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        subplot_titles=[f"Delta to {comparison.labels[comparison.reference]}"]
+                                       + [label for _, label, _ in rows])
+    scatter = go.Scattergl if webgl else go.Scatter
+    palette = qualitative.Plotly + qualitative.Dark24
+    delta = comparison.delta
+    traces, trace_rows = [], []
+    for i, label in enumerate(comparison.labels):
+        colour = palette[i % len(palette)]
+        series = [delta[i]] + [comparison.channels[column][i] for column, _, _ in rows]
+        for row, values in enumerate(series, start=1):
+            # Min/max buckets are vectorized, which matters once the whole field is overlaid
+            x, y = downsample(comparison.distance, values, max_points, 'minmax')
+            traces.append(scatter(x=x, y=y, mode='lines', name=label, legendgroup=label, showlegend=row == 1,
+                                  line=dict(color=colour, width=1.5)))
+            trace_rows.append(row)
+    fig.add_traces(traces, rows=trace_rows, cols=[1] * len(traces))
+
+    fig.update_yaxes(title_text="Delta (s)", row=1, col=1)
+    fig.update_xaxes(title_text="Distance (m)", row=len(rows) + 1, col=1)
+    fig.update_layout(height=250 * (len(rows) + 1), template="plotly_dark", hovermode='x unified')
+    return fig
+
+def generate_minisector_map(comparison, n_sectors=25):
+    # Track outline coloured by which lap was quickest through each mini-sector
+    if comparison is None or 'X' not in comparison.channels or not len(comparison.distance):
         return None
 
-    stints = driver_laps.groupby('Stint').agg(
-        StintStart=('LapNumber', 'min'),
-        StintEnd=('LapNumber', 'max'),
-        Compound=('Compound', 'first'),
-        Driver=('Driver', 'first')
-    ).reset_index()
-
-    compound_colors = {
-        'SOFT': '#FF3333',
-        'MEDIUM': '#FFF200',
-        'HARD': '#F0F0F0',
-        'INTERMEDIATE': '#44D744',
-        'WET': '#2772FF'
-    }
+    bounds, _, winners = comparison.mini_sectors(n_sectors)
+    x = comparison.channels['X'][comparison.reference]
+    y = comparison.channels['Y'][comparison.reference]
+    palette = qualitative.Plotly + qualitative.Dark24
+
+    fig = go.Figure()
+    for i, label in enumerate(comparison.labels):
+        sectors = np.flatnonzero(winners == i)
+        if not len(sectors):
+            continue
+        # One trace per lap: its sectors joined with None gaps
+        xs, ys = [], []
+        for sector in sectors:
+            xs.extend(x[bounds[sector]:bounds[sector + 1] + 1].tolist() + [None])
+            ys.extend(y[bounds[sector]:bounds[sector + 1] + 1].tolist() + [None])
+        fig.add_trace(go.Scatter(x=xs, y=ys, mode='lines', name=f"{label} ({len(sectors)})",
+                                 line=dict(color=palette[i % len(palette)], width=6)))
+
+    fig.update_layout(title="Fastest Driver per Mini-Sector", template="plotly_dark", height=600,
+                      xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor='x'))
+    return fig
+
+def figure_payload_bytes(fig):
+    # Size of the JSON Streamlit ships to the browser for this figure
+    return len(fig.to_json().encode('utf-8'))
+
+def generate_strategy_plot(stints):
+    # stints: one row per stint with Driver, Stint, StintStart, StintEnd and Compound
+    if stints.empty:
+        return None
 
     fig = go.Figure()
     
@@ -73,7 +167,7 @@ def generate_strategy_plot(driver_laps):
 
     for i, stint in stints.iterrows():
         compound = stint['Compound']
-        color = compound_colors.get(compound, 'grey')
+        color = COMPOUND_COLORS.get(compound, 'grey')
         
         fig.add_trace(go.Bar(
             y=[stint['Driver']], 
@@ -102,3 +196,57 @@ def generate_strategy_plot(driver_laps):
     )
     
     return fig
+
+def generate_field_degradation_chart(fits, highlight=None):
+    # fits: one row per stint from fit_stint_degradation, plotted as seconds lost per lap of tyre age
+    if fits.empty:
+        return None
+
+    fits = fits[fits['Slope'].notna()]
+    fig = go.Figure()
+    for compound, stints in fits.groupby('Compound', sort=False):
+        fig.add_trace(go.Scatter(
+            x=stints['Driver'], y=stints['Slope'], mode='markers', name=compound,
+            marker=dict(color=COMPOUND_COLORS.get(compound, 'grey'), size=np.clip(stints['Laps'], 6, 24),
+                        line=dict(width=2, color=['#FF1801' if d == highlight else '#111111' for d in stints['Driver']])),
+            customdata=np.column_stack([stints['Stint'], stints['Laps'], stints['Intercept'], stints['R2']]),
+            hovertemplate='<b>%{x}</b> Stint %{customdata[0]}<br>%{y:+.3f}s per lap over %{customdata[1]} laps'
+                          '<br>Fuel-corrected pace on new tyres: %{customdata[2]:.3f}s'
+                          '<br>R²: %{customdata[3]:.2f}<extra></extra>'
+        ))
+
+    order = fits.groupby('Driver')['Slope'].median().sort_values().index
+    fig.update_layout(title="Tyre Degradation per Stint (Fuel Corrected)", xaxis_title="",
+                      yaxis_title="Lap Time Lost per Lap (s)", template="plotly_dark",
+                      xaxis=dict(categoryorder='array', categoryarray=list(order)),
+                      legend_title_text='Tyre Compound')
+    return fig
+
+def generate_prediction_heatmap(grid, compound, weather):
+    subset = grid[(grid['Compound'] == compound) & (grid['Weather'] == weather)]
+    if subset.empty:
+        return None
+
+    heatmap = subset.pivot(index='TyreLife', columns='LapNumber', values='PredictedLapTime')
+    fig = go.Figure(go.Heatmap(
+        x=heatmap.columns, y=heatmap.index, z=heatmap.values,
+        colorscale='RdYlGn_r', colorbar=dict(title='Lap Time (s)'),
+        hovertemplate='Lap %{x}<br>Tyre Age %{y}<br>%{z:.3f}s<extra></extra>'
+    ))
+    fig.update_layout(title=f"Predicted Lap Time: {compound} / {weather}", xaxis_title="Lap Number",
+                      yaxis_title="Tyre Age (Laps)", template="plotly_dark")
+    return fig
+
+def generate_degradation_curve(grid, lap_number):
+    subset = grid[grid['LapNumber'] == lap_number]
+    if subset.empty:
+        return None
+
+    fig = go.Figure()
+    for (compound, weather), curve in subset.groupby(['Compound', 'Weather'], sort=False):
+        curve = curve.sort_values('TyreLife')
+        fig.add_trace(go.Scatter(x=curve['TyreLife'], y=curve['PredictedLapTime'], mode='lines',
+                                 name=f"{compound} / {weather}"))
+    fig.update_layout(title=f"Predicted Degradation on Lap {lap_number}", xaxis_title="Tyre Age (Laps)",
+                      yaxis_title="Lap Time (s)", template="plotly_dark")
+    return fig
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from model_registry import get_model_registry
+from weather_features import WEATHER_FEATURES, WEATHER_SCENARIOS, get_weather_index
+
+COMPOUNDS = ['HYPERSOFT', 'SUPERSOFT', 'ULTRASOFT', 'SOFT', 'MEDIUM', 'INTERMEDIATE', 'HARD', 'WET']
+
+
+def load_circuit_model(circuit):
+    return get_model_registry().get(circuit)
+
+def scenario_weather(weather_data, scenario):
+    return get_weather_index(weather_data).conditions(scenario)
+
+def build_scenario_point(lap_number, tyre_life, compound, scenario):
+    # One explicit prediction, never filtered: tyres carried over from qualifying can be older than the lap
+    return pd.DataFrame({'LapNumber': [lap_number], 'TyreLife': [tyre_life],
+                         'Compound': [compound], 'Weather': [scenario]})
+
+def build_scenario_grid(lap_numbers, tyre_lives, compounds, scenarios):
+    lap_grid, life_grid, compound_grid, scenario_grid = np.meshgrid(
+        np.asarray(lap_numbers), np.asarray(tyre_lives),
+        np.arange(len(compounds)), np.arange(len(scenarios)), indexing='ij')
+
+    # Sweeps skip tyre ages beyond the lap number, which would mostly be combinations nobody runs
+    valid = (life_grid <= lap_grid).ravel()
+    return pd.DataFrame({
+        'LapNumber': lap_grid.ravel()[valid],
+        'TyreLife': life_grid.ravel()[valid],
+        'Compound': np.asarray(compounds, dtype=object)[compound_grid.ravel()[valid]],
+        'Weather': np.asarray(scenarios, dtype=object)[scenario_grid.ravel()[valid]]
+    })
+
+def build_feature_matrix(column_index, grid, weather_data, year, driver_code, stint):
+    features = np.zeros((len(grid), len(column_index)), dtype=np.float64)
+
+    def fill(name, values):
+        if name in column_index:
+            features[:, column_index[name]] = values
+
+    fill('LapNumber', grid['LapNumber'].to_numpy())
+    fill('TyreLife', grid['TyreLife'].to_numpy())
+    fill('Stint', stint)
+    fill('Year', year)
+    fill(f"Driver_{driver_code}", 1)
+
+    # Weather: one precomputed row per scenario, broadcast to the grid by scenario code
+    scenario_codes, scenarios = pd.factorize(grid['Weather'])
+    scenario_values = get_weather_index(weather_data).scenario_matrix(scenarios)
+    for i, feature in enumerate(WEATHER_FEATURES):
+        fill(feature, scenario_values[scenario_codes, i])
+
+    # One-hot compound columns; compounds the model never saw stay all-zero
+    compound_codes, compounds = pd.factorize(grid['Compound'])
+    compound_columns = np.array([column_index.get(f"Compound_{c}", -1) for c in compounds], dtype=np.int64)
+    row_columns = compound_columns[compound_codes]
+    known = row_columns >= 0
+    features[np.nonzero(known)[0], row_columns[known]] = 1
+
+    return pd.DataFrame(features, columns=list(column_index))
+
+def predict_grid(loaded_model, grid, weather_data, year, driver_code, stint):
+    features = build_feature_matrix(loaded_model.column_index, grid, weather_data, year, driver_code, stint)
+    grid = grid.copy()
+    grid['PredictedLapTime'] = loaded_model.model.predict(features)
+    return grid
+
+def format_lap_time(seconds):
+    mins = int(seconds // 60)
+    sec = seconds % 60
+    return f"{mins}:{sec:06.3f}"
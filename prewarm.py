@@ -0,0 +1,149 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import pandas as pd
+import session_store
+from config import SESSION_TYPES
+from dataset_builder import DEFAULT_YEARS
+from degradation import build_stint_degradation, has_stint_degradation
+from season_index import get_season_index
+from session_summary import build_session_summary, has_session_summary
+
+REPORT_FILE = "prewarm.json"
+WORKER_NICENESS = 10  # workers yield the CPU to the serving process
+
+
+@dataclass(frozen=True)
+class PrewarmJob:
+    year: int
+    circuit: str
+    session: str
+    date: str = None
+    views: int = 0
+
+    @property
+    def key(self):
+        return session_store.session_key(self.year, self.circuit, self.session)
+
+def job_priority(job):
+    # Most viewed first, then the most recent events; races before qualifying before practice
+    recency = -pd.Timestamp(job.date).value if job.date else 0
+    session_rank = SESSION_TYPES.index(job.session) if job.session in SESSION_TYPES else len(SESSION_TYPES)
+    return -job.views, recency, session_rank
+
+def is_warm(year, circuit, racetype):
+    return (session_store.has_telemetry(year, circuit, racetype)
+            and has_session_summary(year, circuit, racetype, telemetry=True)
+            and has_stint_degradation(year, circuit, racetype))
+
+def list_jobs(years, session_types, force=False):
+    views = session_store.load_view_counts()
+    today = pd.Timestamp.now().normalize()
+    jobs = []
+    for year in years:
+        for event in get_season_index(year)['events']:
+            # Events that haven't happened yet have nothing to load
+            if event['date'] is None or pd.Timestamp(event['date']) >= today:
+                continue
+            for racetype in event['sessions'] or SESSION_TYPES:
+                if racetype not in session_types:
+                    continue
+                if not force and is_warm(year, event['location'], racetype):
+                    continue
+                key = session_store.session_key(year, event['location'], racetype)
+                jobs.append(PrewarmJob(year, event['location'], racetype, event['date'], views.get(key, 0)))
+    return sorted(jobs, key=job_priority)
+
+
+# ----------- WORKER -----------
+def init_worker(niceness=WORKER_NICENESS):
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+    logging.getLogger("fastf1").setLevel(logging.ERROR)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+def prewarm_session(year, circuit, racetype, force=False):
+    # Runs in a worker process: FastF1 load, then the derived tables the page reads first
+    start = time.perf_counter()
+    timings = {}
+    try:
+        step = time.perf_counter()
+        session_store.warm_session(year, circuit, racetype, force=force)
+        timings['load_seconds'] = round(time.perf_counter() - step, 2)
+
+        step = time.perf_counter()
+        build_session_summary(year, circuit, racetype, telemetry=True)
+        timings['summary_seconds'] = round(time.perf_counter() - step, 2)
+
+        step = time.perf_counter()
+        build_stint_degradation(year, circuit, racetype)
+        timings['degradation_seconds'] = round(time.perf_counter() - step, 2)
+        return {'status': 'done', **timings, 'seconds': round(time.perf_counter() - start, 2)}
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}", **timings,
+                'seconds': round(time.perf_counter() - start, 2)}
+
+
+# ----------- PREWARM -----------
+def save_report(report):
+    session_store._write_json(report, os.path.join(session_store.STORE_DIR, REPORT_FILE))
+
+def prewarm(years=DEFAULT_YEARS, session_types=SESSION_TYPES, workers=None, limit=None, force=False,
+            niceness=WORKER_NICENESS):
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    jobs = list_jobs(years, session_types, force)
+    if limit:
+        jobs = jobs[:limit]
+    print(f"{len(jobs)} sessions to prewarm ({workers} workers, nice +{niceness})")
+    if not jobs:
+        return {}
+
+    report = {}
+    start = time.perf_counter()
+    # The executor hands out jobs in submission order, so the pool works down the priority list
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(niceness,)) as pool:
+        futures = {pool.submit(prewarm_session, job.year, job.circuit, job.session, force): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            result = future.result()
+            result.update({'year': job.year, 'circuit': job.circuit, 'session': job.session, 'views': job.views,
+                           'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S")})
+            report[job.key] = result
+            save_report(report)
+
+            elapsed = time.perf_counter() - start
+            remaining = elapsed / done * (len(jobs) - done)
+            label = f"[{done}/{len(jobs)}] {job.year} {job.circuit} {job.session}"
+            if result['status'] == 'done':
+                print(f"{label} ✅ load {result['load_seconds']}s, summary {result['summary_seconds']}s, "
+                      f"degradation {result['degradation_seconds']}s (~{remaining / 60:.0f} min left)")
+            else:
+                print(f"{label} ❌ {result['error']}")
+    return report
+
+def summarize_report(report):
+    results = pd.DataFrame(report.values())
+    if results.empty:
+        return "Nothing was prewarmed."
+    done = results[results['status'] == 'done']
+    lines = [f"{len(done)} of {len(results)} sessions warm, {results['seconds'].sum() / 60:.1f} worker-minutes"]
+    for _, row in done.nlargest(5, 'seconds').iterrows():
+        lines.append(f"  slowest: {row['year']} {row['circuit']} {row['session']} ({row['seconds']}s)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load sessions and their summaries into the store in the background.")
+    parser.add_argument("years", nargs="*", type=int, default=DEFAULT_YEARS, help="Seasons (default: all)")
+    parser.add_argument("--sessions", nargs="+", default=SESSION_TYPES, help="Session types to load")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: half the CPUs)")
+    parser.add_argument("--limit", type=int, default=None, help="Only the N highest-priority sessions")
+    parser.add_argument("--nice", type=int, default=WORKER_NICENESS, help="Niceness added to the workers")
+    parser.add_argument("--force", action="store_true", help="Reload sessions that are already warm")
+    args = parser.parse_args()
+
+    prewarm_report = prewarm(args.years, args.sessions, args.workers, args.limit, args.force, args.nice)
+    print(summarize_report(prewarm_report))
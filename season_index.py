@@ -0,0 +1,166 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from config import SESSION_TYPES
+from session_store import FASTF1_CACHE, STORE_DIR
+
+SEASONS_DIR = os.path.join(STORE_DIR, "seasons")
+IN_PROGRESS_TTL = 24 * 60 * 60  # rebuild an unfinished season's index once a day
+
+_seasons = {}
+_locks = {}  # one per year, and one per (year, round) for rosters, so a slow load never blocks other seasons
+_locks_guard = threading.Lock()
+
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+def season_path(year):
+    return os.path.join(SEASONS_DIR, f"{year}.json")
+
+def _fastf1():
+    import fastf1 as ff
+    logging.getLogger("fastf1").setLevel(logging.ERROR)
+    os.makedirs(FASTF1_CACHE, exist_ok=True)
+    ff.Cache.enable_cache(FASTF1_CACHE)
+    return ff
+
+def _load_roster(ff, year, round_number):
+    # Results only: no laps, telemetry or weather are parsed
+    for identifier in ('R', 'Q'):
+        try:
+            session = ff.get_session(year, round_number, identifier)
+            session.load(laps=False, telemetry=False, weather=False, messages=False)
+            results = session.results
+            if results is not None and not results.empty:
+                return dict(zip(results['Abbreviation'], results['FullName']))
+        except Exception:
+            continue
+    return {}
+
+def _write_season_index(index):
+    # Lookups added by get_season_index are rebuilt on load, so they are left out of the file
+    index['complete'] = all(e['drivers'] for e in index['events'])
+    os.makedirs(SEASONS_DIR, exist_ok=True)
+    tmp_path = f"{season_path(index['year'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({key: index[key] for key in ('year', 'built_at', 'complete', 'events')}, f,
+                  indent=2, ensure_ascii=False)
+    os.replace(tmp_path, season_path(index['year']))
+
+def build_season_index(year, previous=None):
+    # The schedule only: a finished event's roster is None until it is first looked up (see event_roster).
+    # Rosters already in the previous index are kept, so the daily rebuild of a running season stays cheap.
+    ff = _fastf1()
+    known = {e['round']: e['drivers'] for e in (previous or {}).get('events', []) if e['drivers']}
+    schedule = ff.get_event_schedule(year, include_testing=False)
+    today = pd.Timestamp.now().normalize()
+    events = []
+    for _, event in schedule.iterrows():
+        held = {event.get(f"Session{i}") for i in range(1, 6)}
+        event_date = pd.Timestamp(event['EventDate'])
+        finished = pd.notnull(event_date) and event_date.tz_localize(None) < today
+        round_number = int(event['RoundNumber'])
+        events.append({
+            'round': round_number,
+            'event_name': event['EventName'],
+            'location': event['Location'],
+            'country': event['Country'],
+            'date': event_date.strftime("%Y-%m-%d") if pd.notnull(event_date) else None,
+            'sessions': [s for s in SESSION_TYPES if s in held],
+            'drivers': known.get(round_number) if finished else {}
+        })
+
+    index = {'year': int(year), 'built_at': time.time(), 'events': events}
+    _write_season_index(index)
+    return index
+
+def _is_stale(index):
+    return not index['complete'] and time.time() - index['built_at'] > IN_PROGRESS_TTL
+
+def get_season_index(year, refresh=False):
+    index = _seasons.get(year)
+    if index is not None and not refresh and not _is_stale(index):
+        return index
+
+    with _lock_for(year):
+        index = _seasons.get(year)
+        if index is not None and not refresh and not _is_stale(index):
+            return index
+        path = season_path(year)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                index = json.load(f)
+        if index is None or refresh or _is_stale(index):
+            index = build_season_index(year, previous=index)
+
+        # Location lookups are precomputed so sidebar reruns are plain dict reads
+        index['by_location'] = {}
+        for event in index['events']:
+            index['by_location'].setdefault(event['location'], event)
+        index['circuits'] = list(index['by_location'])
+        _seasons[year] = index
+        return index
+
+def event_roster(year, event):
+    # One results load the first time a finished event is looked up, saved to the index straight away
+    if event['drivers'] is not None:
+        return event['drivers']
+    with _lock_for((year, event['round'])):
+        if event['drivers'] is None:
+            drivers = _load_roster(_fastf1(), year, event['round'])
+            with _lock_for(year):
+                event['drivers'] = drivers
+                # The index may have been rebuilt meanwhile; the roster goes into the current one
+                index = _seasons.get(year)
+                if index is not None:
+                    for current in index['events']:
+                        if current['round'] == event['round'] and current['drivers'] is None:
+                            current['drivers'] = drivers
+                    _write_season_index(index)
+    return event['drivers']
+
+def fill_rosters(year):
+    index = get_season_index(year)
+    for event in index['events']:
+        event_roster(year, event)
+    return index
+
+
+# ----------- SIDEBAR LOOKUPS -----------
+def get_circuits_for_year(year):
+    return get_season_index(year)['circuits']
+
+def get_event(year, circuit):
+    return get_season_index(year)['by_location'].get(circuit)
+
+def get_session_types(year, circuit):
+    event = get_event(year, circuit)
+    return event['sessions'] if event and event['sessions'] else SESSION_TYPES
+
+def get_drivers_for_event(year, circuit):
+    event = get_event(year, circuit)
+    if event and event_roster(year, event):
+        return event['drivers']
+    # Events without results yet fall back to the latest roster of the season
+    for other in reversed(get_season_index(year)['events']):
+        if event_roster(year, other):
+            return other['drivers']
+    return {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-season schedule and driver roster index.")
+    parser.add_argument("years", nargs="+", type=int)
+    args = parser.parse_args()
+
+    for season in args.years:
+        start = time.perf_counter()
+        get_season_index(season, refresh=True)
+        season_index = fill_rosters(season)
+        print(f"✅ {season}: {len(season_index['events'])} events ({time.perf_counter() - start:.1f}s)")
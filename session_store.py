@@ -0,0 +1,280 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from config import SESSION_TYPES
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest writes are only serialised within one process
+    fcntl = None
+
+logging.getLogger("fastf1").setLevel(logging.ERROR)
+
+STORE_DIR = "./session_store"
+MANIFEST_FILE = "manifest.json"
+VIEWS_FILE = "views.json"
+FASTF1_CACHE = "./fastf1_cache"
+
+CAR_DATA_COLUMNS = ['SessionTime', 'RPM', 'Speed', 'nGear', 'Throttle', 'Brake', 'DRS']
+POS_DATA_COLUMNS = ['SessionTime', 'X', 'Y', 'Z']
+
+_telemetry_sessions = set()  # sessions whose telemetry is known to be in the store
+_telemetry_locks = defaultdict(threading.Lock)
+_store_lock = threading.Lock()
+
+
+def safe_name(name):
+    return re.sub(r'[\\/*?:"<>|]', "", str(name)).replace(" ", "_")
+
+def session_key(year, circuit, racetype):
+    return f"{year}/{safe_name(circuit)}/{safe_name(racetype)}"
+
+def session_dir(year, circuit, racetype):
+    return os.path.join(STORE_DIR, session_key(year, circuit, racetype))
+
+def table_path(year, circuit, racetype, table, driver_code=None):
+    if driver_code is None:
+        return os.path.join(session_dir(year, circuit, racetype), f"{table}.arrow")
+    return os.path.join(session_dir(year, circuit, racetype), table, f"{driver_code}.arrow")
+
+
+# ----------- MANIFEST -----------
+def load_manifest():
+    path = os.path.join(STORE_DIR, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+@contextmanager
+def store_lock():
+    # Prewarm workers and the app update the same JSON files, so read-modify-write is serialised across processes
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _store_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(STORE_DIR, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _write_json(data, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def update_entry(key, fn):
+    # fn gets the current entry (or None) and returns the new one, all under the store lock,
+    # so a prewarm worker and the app adding different tables to one session keep each other's keys
+    with store_lock():
+        manifest = load_manifest()
+        entry = fn(manifest.get(key))
+        if entry is None:
+            manifest.pop(key, None)
+        else:
+            manifest[key] = entry
+        _write_json(manifest, os.path.join(STORE_DIR, MANIFEST_FILE))
+        return entry
+
+def update_manifest(key, entry):
+    update_entry(key, lambda _: entry)
+
+def load_view_counts():
+    path = os.path.join(STORE_DIR, VIEWS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def record_view(year, circuit, racetype):
+    # Feeds the prewarm priority: sessions people actually open are loaded first
+    with store_lock():
+        views = load_view_counts()
+        key = session_key(year, circuit, racetype)
+        views[key] = views.get(key, 0) + 1
+        _write_json(views, os.path.join(STORE_DIR, VIEWS_FILE))
+
+def get_session_entry(year, circuit, racetype):
+    return load_manifest().get(session_key(year, circuit, racetype))
+
+def has_session(year, circuit, racetype):
+    entry = get_session_entry(year, circuit, racetype)
+    if entry is None:
+        return False
+    return os.path.exists(table_path(year, circuit, racetype, 'laps'))
+
+def has_telemetry(year, circuit, racetype):
+    key = session_key(year, circuit, racetype)
+    if key in _telemetry_sessions:
+        return True
+    entry = get_session_entry(year, circuit, racetype)
+    # Entries written before telemetry became lazy always included it
+    if entry is None or not entry.get('telemetry', bool(entry.get('drivers'))):
+        return False
+    _telemetry_sessions.add(key)
+    return True
+
+
+# ----------- WRITE -----------
+def _write_table(frame, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(pd.DataFrame(frame).reset_index(drop=True), preserve_index=False)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Uncompressed Arrow IPC so reads can be memory-mapped without decoding
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+def _session_has_telemetry(session):
+    from fastf1.core import DataNotLoadedError
+    try:
+        return bool(session.car_data)
+    except DataNotLoadedError:
+        return False
+
+def _write_telemetry_tables(year, circuit, racetype, session):
+    number_to_code = dict(zip(session.results['DriverNumber'].astype(str), session.results['Abbreviation']))
+    drivers = []
+    for table, source, columns in (('car_data', session.car_data, CAR_DATA_COLUMNS),
+                                   ('pos_data', session.pos_data, POS_DATA_COLUMNS)):
+        for driver_number, data in (source or {}).items():
+            driver_code = number_to_code.get(str(driver_number))
+            if driver_code is None or data.empty:
+                continue
+            data = data[[col for col in columns if col in data.columns]]
+            _write_table(data, table_path(year, circuit, racetype, table, driver_code))
+            if driver_code not in drivers:
+                drivers.append(driver_code)
+    return sorted(drivers)
+
+def write_session(year, circuit, racetype, session):
+    # Laps, results and weather always; telemetry only if the session was loaded with it
+    tables = {
+        'laps': _write_table(session.laps, table_path(year, circuit, racetype, 'laps')),
+        'results': _write_table(session.results, table_path(year, circuit, racetype, 'results')),
+        'weather': _write_table(session.weather_data, table_path(year, circuit, racetype, 'weather'))
+    }
+    telemetry = _session_has_telemetry(session)
+    drivers = _write_telemetry_tables(year, circuit, racetype, session) if telemetry else []
+
+    entry = {
+        'year': int(year),
+        'circuit': circuit,
+        'session': racetype,
+        'total_laps': None if pd.isnull(session.total_laps) else int(session.total_laps),
+        'tables': tables,
+        'telemetry': telemetry,
+        'drivers': drivers,
+        'written_at': time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    key = session_key(year, circuit, racetype)
+    _telemetry_sessions.discard(key)
+    update_manifest(key, entry)
+    return entry
+
+def write_telemetry(year, circuit, racetype, session):
+    drivers = _write_telemetry_tables(year, circuit, racetype, session)
+
+    def add_telemetry(entry):
+        entry.update({
+            'telemetry': True,
+            'drivers': drivers,
+            'telemetry_written_at': time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+        return entry
+    return update_entry(session_key(year, circuit, racetype), add_telemetry)
+
+# ----------- READ -----------
+def read_table(path, columns=None, time_range=None):
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    if columns is not None:
+        available = pa.ipc.open_file(pa.memory_map(path)).schema.names
+        columns = [col for col in columns if col in available]
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    if time_range is not None and 'SessionTime' in table.column_names:
+        # Rows are in SessionTime order, so only the requested window is converted to pandas
+        session_time = table['SessionTime'].to_numpy()
+        start, end = (pd.Timedelta(bound).to_timedelta64() for bound in time_range)
+        lo = int(session_time.searchsorted(start, side='left'))
+        hi = int(session_time.searchsorted(end, side='right'))
+        table = table.slice(lo, hi - lo)
+    return table.to_pandas()
+
+def read_session(year, circuit, racetype, laps_columns=None):
+    # FastF1 is imported on first use, so processes that only serve the sidebar never pay for it
+    from fastf1.core import Laps
+    entry = get_session_entry(year, circuit, racetype)
+    laps = read_table(table_path(year, circuit, racetype, 'laps'), laps_columns)
+    results = read_table(table_path(year, circuit, racetype, 'results'))
+    weather = read_table(table_path(year, circuit, racetype, 'weather'))
+    return Laps(laps), results, entry['total_laps'], weather
+
+def read_driver_table(year, circuit, racetype, table, driver_code, columns=None, time_range=None):
+    return read_table(table_path(year, circuit, racetype, table, driver_code), columns, time_range)
+
+
+# ----------- FASTF1 INGEST -----------
+def load_fastf1_session(year, circuit, racetype, telemetry=True):
+    import fastf1 as ff
+    os.makedirs(FASTF1_CACHE, exist_ok=True)
+    ff.Cache.enable_cache(FASTF1_CACHE)
+
+    session = ff.get_session(year, circuit, racetype)
+    session.load(laps=True, telemetry=telemetry, weather=True, messages=False)
+    return session
+
+def ensure_telemetry(year, circuit, racetype):
+    # FastF1 decodes car and position data for the whole session at once, so this runs once per session
+    if has_telemetry(year, circuit, racetype):
+        return
+    with _telemetry_locks[session_key(year, circuit, racetype)]:
+        if has_telemetry(year, circuit, racetype):
+            return
+        session = load_fastf1_session(year, circuit, racetype, telemetry=True)
+        if has_session(year, circuit, racetype):
+            write_telemetry(year, circuit, racetype, session)
+        else:
+            write_session(year, circuit, racetype, session)
+
+def warm_session(year, circuit, racetype, force=False):
+    if not force and has_telemetry(year, circuit, racetype):
+        return get_session_entry(year, circuit, racetype)
+    session = load_fastf1_session(year, circuit, racetype)
+    return write_session(year, circuit, racetype, session)
+
+def warm_season(year, session_types, force=False):
+    import fastf1 as ff
+    schedule = ff.get_event_schedule(year, include_testing=False)
+    for circuit in schedule['Location'].unique():
+        for racetype in session_types:
+            start = time.perf_counter()
+            try:
+                warm_session(year, circuit, racetype, force=force)
+                print(f"✅ {year} {circuit} {racetype} ({time.perf_counter() - start:.1f}s)")
+            except Exception as e:
+                print(f"❌ {year} {circuit} {racetype}: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the local session store for whole seasons.")
+    parser.add_argument("years", nargs="+", type=int, help="Seasons to load, e.g. 2023 2024")
+    parser.add_argument("--sessions", nargs="+", default=SESSION_TYPES, help="Session types to load")
+    parser.add_argument("--force", action="store_true", help="Reload sessions already in the store")
+    args = parser.parse_args()
+
+    for season in args.years:
+        warm_season(season, args.sessions, force=args.force)
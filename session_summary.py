@@ -0,0 +1,313 @@
+import os
+from dataclasses import dataclass, asdict
+import numpy as np
+import pandas as pd
+import session_store
+from cache_backend import cached
+from telemetry import LAP_COLUMNS, load_driver_telemetry
+
+SECTOR_COLUMNS = ['Sector1Time', 'Sector2Time', 'Sector3Time']
+SECTOR_NAMES = ['Sector 1', 'Sector 2', 'Sector 3']
+SPEED_TRAP_COLUMNS = ['SpeedFL', 'SpeedST', 'SpeedI1', 'SpeedI2']
+DRS_OPEN = 10  # DRS value is usually > 8 when the flap is open
+RESULT_COLUMNS = {'Position': 'position', 'Status': 'status'}
+
+
+@dataclass(frozen=True)
+class DriverSummary:
+    driver_code: str
+    team: str = None
+    position: float = float('nan')
+    status: str = None
+    lap_count: int = 0
+    fastest_lap_index: int = None
+    fastest_lap_time: pd.Timedelta = pd.NaT
+    fastest_lap_number: int = None
+    fastest_lap_compound: str = None
+    fastest_lap_avg_speed: float = float('nan')
+    longest_stint: int = None
+    longest_stint_length: int = 0
+    longest_stint_compound: str = None
+    best_s1: pd.Timedelta = pd.NaT
+    best_s2: pd.Timedelta = pd.NaT
+    best_s3: pd.Timedelta = pd.NaT
+    best_sector: str = None
+    best_sector_time: float = float('inf')
+    best_sector_lap: int = None
+    total_time: pd.Timedelta = pd.NaT
+    telemetry_laps: int = 0
+    total_distance: float = float('nan')
+    avg_gear_shifts: float = float('nan')
+    top_speed: float = float('nan')
+    drs_laps: int = 0
+
+    @property
+    def has_laps(self):
+        return self.lap_count > 0
+
+    @property
+    def has_telemetry(self):
+        return self.telemetry_laps > 0
+
+    @property
+    def has_result(self):
+        return self.status is not None
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _driver_codes(df, driver_code):
+    # Integer group codes in order of first appearance, plus the driver for each code
+    if 'Driver' in df.columns:
+        codes, drivers = pd.factorize(df['Driver'])
+        return codes, np.asarray(drivers, dtype=object)
+    return np.zeros(len(df), dtype=np.intp), np.array([driver_code], dtype=object)
+
+def _first_per_group(codes, n_groups, *sort_keys):
+    # Row of each group's first entry after sorting by sort_keys (ties keep row order), -1 if none
+    order = np.lexsort(tuple(reversed(sort_keys)) + (codes,)) if sort_keys else np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(n_groups))
+    found = (starts < len(order)) & (sorted_codes[np.minimum(starts, len(order) - 1)] == np.arange(n_groups))
+    return np.where(found, order[np.minimum(starts, len(order) - 1)], -1)
+
+def _first_min_rows(codes, n_groups, values):
+    # Each group's earliest row holding its minimum, -1 where the group only has missing values
+    values = np.where(np.isnan(values), np.inf, values)
+    rows = _first_per_group(codes, n_groups, values)
+    return np.where((rows >= 0) & np.isfinite(values[np.maximum(rows, 0)]), rows, -1)
+
+def _timedelta_ns(series):
+    values = series.to_numpy(dtype='timedelta64[ns]')
+    return values.astype('int64').astype('float64'), np.isnat(values)
+
+def _take(values, rows, missing=None):
+    return np.array([values[row] if row >= 0 else missing for row in rows], dtype=object)
+
+def summarize_laps(laps, driver_code=None):
+    # One row per driver: fastest lap, sector bests and longest stint in a single vectorized pass
+    laps = pd.DataFrame(laps)
+    if laps.empty:
+        return pd.DataFrame()
+    codes, drivers = _driver_codes(laps, driver_code)
+    n_drivers = len(drivers)
+
+    lap_ns, lap_missing = _timedelta_ns(laps['LapTime'])
+    lap_ns[lap_missing] = np.nan
+    lap_numbers = laps['LapNumber'].to_numpy(dtype='float64')
+
+    total_ns = np.zeros(n_drivers, dtype='int64')
+    np.add.at(total_ns, codes[~lap_missing], lap_ns[~lap_missing].astype('int64'))
+    fastest = _first_min_rows(codes, n_drivers, lap_ns)
+    lap_times = laps['LapTime'].to_numpy(dtype='timedelta64[ns]')
+
+    speeds = laps.reindex(columns=SPEED_TRAP_COLUMNS).to_numpy(dtype='float64')
+    speed_counts = (~np.isnan(speeds)).sum(axis=1)
+    avg_speeds = np.divide(np.nansum(speeds, axis=1), speed_counts, out=np.full(len(laps), np.nan),
+                           where=speed_counts > 0)
+
+    teams = laps['Team'].to_numpy(dtype=object) if 'Team' in laps.columns else np.full(len(laps), None, dtype=object)
+    summary = {
+        'team': teams[_first_per_group(codes, n_drivers)],
+        'lap_count': np.bincount(codes, minlength=n_drivers),
+        'fastest_lap_index': _take(laps.index.to_numpy(), fastest),
+        'total_time': total_ns.astype('timedelta64[ns]'),
+        'fastest_lap_time': np.where(fastest >= 0, lap_times[fastest], np.timedelta64('NaT')),
+        'fastest_lap_number': _take(lap_numbers, fastest),
+        'fastest_lap_compound': _take(laps['Compound'].to_numpy(dtype=object), fastest),
+        'fastest_lap_avg_speed': np.where(fastest >= 0, avg_speeds[fastest], np.nan)
+    }
+
+    # Sector bests; the earliest sector wins a tie for the best single sector, as does the earliest lap
+    best_rows, best_seconds = [], []
+    for i, col in enumerate(SECTOR_COLUMNS, start=1):
+        sector_ns, sector_missing = _timedelta_ns(laps[col])
+        sector_ns[sector_missing] = np.nan
+        rows = _first_min_rows(codes, n_drivers, sector_ns)
+        best = np.where(rows >= 0, sector_ns[rows], np.nan)
+        summary[f"best_s{i}"] = best.astype('timedelta64[ns]')
+        best_rows.append(rows)
+        best_seconds.append(best / 1e9)
+    best_rows, best_seconds = np.column_stack(best_rows), np.column_stack(best_seconds)
+    has_sector = ~np.isnan(best_seconds).all(axis=1)
+    best = np.argmin(np.where(np.isnan(best_seconds), np.inf, best_seconds), axis=1)
+    groups = np.arange(n_drivers)
+    summary['best_sector'] = np.where(has_sector, np.asarray(SECTOR_NAMES, dtype=object)[best], None)
+    summary['best_sector_time'] = np.where(has_sector, best_seconds[groups, best], np.inf)
+    summary['best_sector_lap'] = _take(lap_numbers, np.where(has_sector, best_rows[groups, best], -1))
+
+    # Stint lengths, then the most used compound of each driver's longest stint
+    stint_values = laps['Stint'].to_numpy(dtype='float64')
+    compound_codes, compound_names = pd.factorize(laps['Compound'], sort=True)
+    has_stint = ~np.isnan(stint_values)
+    keys = np.column_stack([codes[has_stint], stint_values[has_stint].astype('int64'), compound_codes[has_stint]])
+    longest_stint = np.full(n_drivers, None, dtype=object)
+    longest_length = np.zeros(n_drivers, dtype='int64')
+    longest_compound = np.full(n_drivers, None, dtype=object)
+    if len(keys):
+        counted, counts = np.unique(keys, axis=0, return_counts=True)
+        stints, stint_of = np.unique(counted[:, :2], axis=0, return_inverse=True)
+        stint_of = stint_of.ravel()
+        lengths = np.bincount(stint_of, weights=counts).astype('int64')
+
+        first = _first_per_group(stints[:, 0], n_drivers, -lengths, stints[:, 1])
+        has_longest = first >= 0
+        longest_stint[has_longest] = stints[first[has_longest], 1]
+        longest_length[has_longest] = lengths[first[has_longest]]
+
+        named = counted[:, 2] >= 0
+        mode_rows = _first_per_group(stint_of[named], len(stints), -counts[named], counted[named, 2])
+        stint_compound = np.array([compound_names[counted[named][row, 2]] if row >= 0 else None
+                                   for row in mode_rows], dtype=object)
+        longest_compound[has_longest] = stint_compound[first[has_longest]]
+    summary['longest_stint'] = longest_stint
+    summary['longest_stint_length'] = longest_length
+    summary['longest_stint_compound'] = longest_compound
+    return pd.DataFrame(summary, index=pd.Index(drivers, name='Driver'))
+
+def summarize_telemetry(telemetry, driver_code=None):
+    # Samples are contiguous per lap, so per-lap aggregates are plain segment reductions
+    if telemetry is None or telemetry.empty:
+        return pd.DataFrame()
+    codes, drivers = _driver_codes(telemetry, driver_code)
+    n_drivers = len(drivers)
+    lap_numbers = telemetry['LapNumber'].to_numpy()
+    gears = telemetry['nGear'].to_numpy()
+
+    same_lap = (lap_numbers[1:] == lap_numbers[:-1]) & (codes[1:] == codes[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(~same_lap) + 1))
+    shifted = np.zeros(len(telemetry), dtype='int64')
+    shifted[1:] = (gears[1:] != gears[:-1]) & same_lap
+
+    lap_shifts = np.add.reduceat(shifted, starts)
+    lap_drs = np.maximum.reduceat(telemetry['DRS'].to_numpy(), starts) >= DRS_OPEN
+    lap_speed = np.maximum.reduceat(telemetry['Speed'].to_numpy(dtype='float64'), starts)
+    lap_distance = np.maximum.reduceat(telemetry['Distance'].to_numpy(dtype='float64'), starts)
+    lap_codes = codes[starts]
+
+    top_speed = np.full(n_drivers, -np.inf)
+    total_distance = np.full(n_drivers, -np.inf)
+    np.maximum.at(top_speed, lap_codes, lap_speed)
+    np.maximum.at(total_distance, lap_codes, lap_distance)
+    lap_counts = np.bincount(lap_codes, minlength=n_drivers)
+    return pd.DataFrame({
+        'telemetry_laps': lap_counts,
+        'avg_gear_shifts': np.bincount(lap_codes, weights=lap_shifts, minlength=n_drivers) / np.maximum(lap_counts, 1),
+        'drs_laps': np.bincount(lap_codes, weights=lap_drs, minlength=n_drivers).astype('int64'),
+        'top_speed': top_speed,
+        'total_distance': total_distance
+    }, index=pd.Index(drivers, name='Driver'))
+
+def summary_from_row(driver_code, row):
+    fields = DriverSummary.__dataclass_fields__
+    values = {}
+    for name, value in row.items():
+        if name not in fields:
+            continue
+        if isinstance(value, np.generic):
+            value = value.item()
+        if name in ('best_s1', 'best_s2', 'best_s3', 'fastest_lap_time', 'total_time'):
+            value = pd.Timedelta(value) if pd.notnull(value) else pd.NaT
+        elif name in ('lap_count', 'telemetry_laps', 'drs_laps', 'longest_stint_length'):
+            value = int(value) if pd.notnull(value) else 0
+        elif name in ('fastest_lap_index', 'fastest_lap_number', 'longest_stint', 'best_sector_lap'):
+            value = int(value) if pd.notnull(value) else None
+        elif name in ('team', 'status', 'fastest_lap_compound', 'longest_stint_compound', 'best_sector'):
+            value = str(value) if pd.notnull(value) else None
+        values[name] = value
+    return DriverSummary(driver_code=driver_code, **values)
+
+def summarize_driver(driver_laps, telemetry, driver_code):
+    row = {}
+    if driver_laps is not None and not driver_laps.empty:
+        lap_summary = summarize_laps(driver_laps, driver_code)
+        if driver_code in lap_summary.index:
+            row.update(lap_summary.loc[driver_code].to_dict())
+    if telemetry is not None and not telemetry.empty:
+        telemetry_summary = summarize_telemetry(telemetry, driver_code)
+        if driver_code in telemetry_summary.index:
+            row.update(telemetry_summary.loc[driver_code].to_dict())
+    return summary_from_row(driver_code, row)
+
+def summarize_stints(laps):
+    # Start/end lap and first known compound of every stint, the bars of the strategy plot
+    stints = pd.DataFrame(laps).groupby(['Driver', 'Stint'], sort=True).agg(
+        StintStart=('LapNumber', 'min'),
+        StintEnd=('LapNumber', 'max'),
+        Compound=('Compound', 'first')
+    )
+    return stints.reset_index()
+
+def get_driver_stints(stints, driver_code):
+    if stints.empty:
+        return stints
+    return stints[stints['Driver'] == driver_code]
+
+
+# ----------- SESSION SUMMARY TABLES -----------
+def has_session_summary(year, circuit, racetype, telemetry=False):
+    # write_session replaces the manifest entry, so a rewritten session drops its stale summary
+    entry = session_store.get_session_entry(year, circuit, racetype)
+    if entry is None or 'summary' not in entry['tables']:
+        return False
+    if telemetry and not entry.get('summary_telemetry', False):
+        return False
+    return os.path.exists(session_store.table_path(year, circuit, racetype, 'summary'))
+
+def summarize_session(all_laps, results, telemetry_loader=None):
+    # Without a telemetry loader only the lap and result columns are filled in
+    timed_laps = all_laps[all_laps['LapTime'].notnull()]
+    summary = summarize_laps(timed_laps)
+
+    telemetry_rows = []
+    for driver_code in (summary.index if telemetry_loader is not None else []):
+        telemetry = telemetry_loader(driver_code)
+        if not telemetry.empty:
+            telemetry_rows.append(summarize_telemetry(telemetry, driver_code))
+    if telemetry_rows:
+        summary = summary.join(pd.concat(telemetry_rows), how='left')
+
+    if results is not None and not results.empty:
+        result_rows = results.drop_duplicates('Abbreviation').set_index('Abbreviation')
+        result_rows = result_rows.reindex(columns=list(RESULT_COLUMNS)).rename(columns=RESULT_COLUMNS)
+        summary = summary.join(result_rows, how='outer')
+    summary.index.name = 'Driver'
+    return summary, summarize_stints(timed_laps)
+
+def build_session_summary(year, circuit, racetype, telemetry=True):
+    if not session_store.has_session(year, circuit, racetype):
+        session = session_store.load_fastf1_session(year, circuit, racetype, telemetry=telemetry)
+        session_store.write_session(year, circuit, racetype, session)
+    all_laps, results, _, _ = session_store.read_session(year, circuit, racetype, LAP_COLUMNS)
+    telemetry_loader = None
+    if telemetry:
+        telemetry_loader = lambda driver_code: load_driver_telemetry(year, circuit, racetype, all_laps, driver_code)
+    summary, stints = summarize_session(all_laps, results, telemetry_loader)
+
+    tables = {
+        'stints': session_store._write_table(stints, session_store.table_path(year, circuit, racetype, 'stints')),
+        'summary': session_store._write_table(
+            summary.reset_index(), session_store.table_path(year, circuit, racetype, 'summary'))
+    }
+
+    def add_tables(entry):
+        entry['summary_telemetry'] = telemetry
+        entry['tables'].update(tables)
+        return entry
+    session_store.update_entry(session_store.session_key(year, circuit, racetype), add_tables)
+    return summary, stints
+
+@cached("session_summary", show_spinner="Summarising Drivers...")
+def load_session_summary(year, circuit, racetype, telemetry=False):
+    # The lap-level table is cheap; telemetry aggregates are added the first time they are asked for
+    if not has_session_summary(year, circuit, racetype, telemetry):
+        build_session_summary(year, circuit, racetype, telemetry)
+    summary = session_store.read_table(session_store.table_path(year, circuit, racetype, 'summary'))
+    stints = session_store.read_table(session_store.table_path(year, circuit, racetype, 'stints'))
+    return summary.set_index('Driver'), stints
+
+def get_driver_summary(summary, driver_code):
+    if driver_code not in summary.index:
+        return DriverSummary(driver_code)
+    return summary_from_row(driver_code, summary.loc[driver_code].to_dict())
@@ -1,47 +1,245 @@
-import fastf1 as ff
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import logging
 import streamlit as st
-import os
+import session_store
+from cache_backend import cached
+from instrumentation import record_cache
 
 logging.getLogger("fastf1").setLevel(logging.ERROR)
 
-@st.cache_data(show_spinner="Loading Race Data...")
+# Compact dtypes for the extracted car data channels
+TELEMETRY_DTYPES = {
+    'RPM': 'float32',
+    'Speed': 'float32',
+    'Throttle': 'float32',
+    'nGear': 'int8',
+    'DRS': 'int8',
+    'Brake': 'bool'
+}
+
+# Lap columns the dashboard pages read from the session store
+LAP_COLUMNS = [
+    'Time', 'Driver', 'DriverNumber', 'LapTime', 'LapNumber', 'Stint',
+    'PitOutTime', 'PitInTime', 'Sector1Time', 'Sector2Time', 'Sector3Time',
+    'SpeedI1', 'SpeedI2', 'SpeedFL', 'SpeedST', 'Compound', 'TyreLife',
+    'Team', 'LapStartTime', 'TrackStatus', 'IsAccurate'
+]
+
+LAP_CACHE_MB = int(os.environ.get("F1_LAP_CACHE_MB", 128))
+
+# Extra time read around a lap range so nearest-sample merges at the lap edges stay exact
+TELEMETRY_PADDING = pd.Timedelta(seconds=5)
+
+class LapTelemetryCache:
+    # LRU of extracted per-lap telemetry keyed by (session, driver, lap), bounded by memory use
+    def __init__(self, max_bytes=LAP_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._laps = OrderedDict()
+        self._cached_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._laps.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._laps.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, frame, nbytes=None):
+        if nbytes is None:
+            nbytes = int(frame.memory_usage(deep=False).sum())
+        with self._lock:
+            previous = self._laps.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= previous[1]
+            self._laps[key] = (frame, nbytes)
+            self._cached_bytes += nbytes
+            while self._cached_bytes > self.max_bytes and len(self._laps) > 1:
+                _, (_, evicted_bytes) = self._laps.popitem(last=False)
+                self._cached_bytes -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._laps.clear()
+            self._cached_bytes = 0
+
+    def cache_info(self):
+        with self._lock:
+            return {'laps': len(self._laps), 'bytes': self._cached_bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+@st.cache_resource
+def get_lap_cache():
+    return LapTelemetryCache()
+
+
+@cached("session_data", show_spinner="Loading Race Data...")
 def load_session_data(year, circuit, racetype):
-    CACHE = "./fastf1_cache"
-    if not os.path.exists(CACHE):
-        os.makedirs(CACHE)
-        
-    ff.Cache.enable_cache(CACHE)
-    
-    session = ff.get_session(year, circuit, racetype)
-    session.load(laps=True, telemetry=True, weather=True, messages=False)
-    return session.laps , session.results, session.total_laps, session.weather_data
+    # Laps, results and weather only; telemetry is decoded the first time a telemetry view asks for it
+    if not session_store.has_session(year, circuit, racetype):
+        session = session_store.load_fastf1_session(year, circuit, racetype, telemetry=False)
+        session_store.write_session(year, circuit, racetype, session)
+    return session_store.read_session(year, circuit, racetype, LAP_COLUMNS)
+
+def _timed_laps(laps):
+    # Laps with both a start and an end time; skips the copy when nothing is missing
+    valid = laps['LapStartTime'].notna().to_numpy() & laps['Time'].notna().to_numpy()
+    return laps if valid.all() else laps[valid]
+
+def lap_time_range(laps):
+    laps = _timed_laps(laps)
+    if laps.empty:
+        return None
+    return laps['LapStartTime'].min() - TELEMETRY_PADDING, laps['Time'].max() + TELEMETRY_PADDING
+
+def load_driver_car_data(year, circuit, racetype, driver_code, laps=None):
+    # With laps given, only the samples covering those laps are read from the store
+    session_store.ensure_telemetry(year, circuit, racetype)
+    time_range = lap_time_range(laps) if laps is not None else None
+    return session_store.read_driver_table(year, circuit, racetype, 'car_data', driver_code,
+                                           session_store.CAR_DATA_COLUMNS, time_range)
+
+def load_driver_pos_data(year, circuit, racetype, driver_code, laps=None):
+    session_store.ensure_telemetry(year, circuit, racetype)
+    time_range = lap_time_range(laps) if laps is not None else None
+    return session_store.read_driver_table(year, circuit, racetype, 'pos_data', driver_code,
+                                           session_store.POS_DATA_COLUMNS, time_range)
 
 def get_driver_laps(all_laps, driver_code):
     driver_laps = all_laps.pick_drivers(driver_code)
     driver_laps = driver_laps[driver_laps['LapTime'].notnull()]
     return driver_laps
 
-def get_driver_telemetry(all_laps, driver_code):
-    driver_laps = all_laps.pick_driver(driver_code).pick_quicklaps()
-    
+def extract_laps_telemetry(car_data, laps):
+    # Slices a driver's car data for every lap at once, same bounds as Lap.get_car_data()
+    laps = _timed_laps(laps)
+    if car_data is None or car_data.empty or laps.empty:
+        return pd.DataFrame()
+
+    session_time = car_data['SessionTime'].to_numpy(dtype='timedelta64[ns]')
+    starts = laps['LapStartTime'].to_numpy(dtype='timedelta64[ns]')
+    ends = laps['Time'].to_numpy(dtype='timedelta64[ns]')
+
+    lo = np.searchsorted(session_time, starts, side='left')
+    hi = np.searchsorted(session_time, ends, side='right')
+    counts = hi - lo
+    has_data = counts > 0
+    if not has_data.any():
+        return pd.DataFrame()
+
+    laps = laps[has_data]
+    starts, lo, counts = starts[has_data], lo[has_data], counts[has_data]
+
+    total = int(counts.sum())
+    lap_idx = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.cumsum(counts) - counts
+    rows = lo[lap_idx] + (np.arange(total) - offsets[lap_idx])
+
+    lap_time = session_time[rows] - starts[lap_idx]
+    seconds = lap_time / np.timedelta64(1, 's')
+
+    # Distance: integrate speed over time, restarting at each lap boundary
+    dt = np.empty(total)
+    dt[0] = seconds[0]
+    dt[1:] = np.diff(seconds)
+    dt[offsets] = seconds[offsets]
+    speed = car_data['Speed'].to_numpy(dtype='float64')[rows]
+    ds = speed / 3.6 * dt
+    cumulative = np.cumsum(ds)
+    distance = cumulative - (cumulative[offsets] - ds[offsets])[lap_idx]
+
+    telemetry = pd.DataFrame({
+        'SessionTime': session_time[rows],
+        'Time': lap_time,
+    })
+    for col, dtype in TELEMETRY_DTYPES.items():
+        if col in car_data.columns:
+            values = car_data[col].to_numpy()[rows]
+            if dtype != 'bool':
+                values = np.nan_to_num(values.astype('float64'))
+            telemetry[col] = values.astype(dtype)
+    telemetry['Distance'] = distance.astype('float32')
+    telemetry['LapNumber'] = laps['LapNumber'].to_numpy()[lap_idx].astype('int16')
+    telemetry['Compound'] = pd.Categorical(laps['Compound'].to_numpy()[lap_idx])
+    telemetry['Stint'] = np.nan_to_num(laps['Stint'].to_numpy(dtype='float64')[lap_idx]).astype('int8')
+    return telemetry
+
+def get_driver_telemetry(all_laps, driver_code, car_data):
+    driver_laps = all_laps.pick_drivers(driver_code).pick_quicklaps()
+
     if driver_laps.empty:
         return pd.DataFrame()
+    return extract_laps_telemetry(car_data, driver_laps)
+
+def attach_position(telemetry, pos_data):
+    # Position samples are attached to the nearest car sample
+    if telemetry.empty or pos_data is None or pos_data.empty:
+        return telemetry
+    pos_data = pos_data[['SessionTime', 'X', 'Y', 'Z']].astype({'X': 'float32', 'Y': 'float32', 'Z': 'float32'})
+    return pd.merge_asof(telemetry, pos_data, on='SessionTime', direction='nearest')
 
-    all_telemetry = []
-    for _, lap in driver_laps.iterrows():
-        try:
-            telemetry_chunk = lap.get_car_data().add_distance()
-            telemetry_chunk['LapNumber'] = lap['LapNumber']
-            telemetry_chunk['Compound'] = lap['Compound']
-            telemetry_chunk['Stint'] = lap['Stint']
-            
-            all_telemetry.append(telemetry_chunk)
-        except Exception as e:
-            print(f"Could not load telemetry for Lap {lap['LapNumber']}: {e}")
-            continue
-
-    if not all_telemetry:
+def get_lap_telemetry(lap, car_data, pos_data):
+    # lap is a single-row laps frame
+    return attach_position(extract_laps_telemetry(car_data, lap), pos_data)
+
+
+# ----------- PER-LAP CACHE -----------
+def load_laps_telemetry(year, circuit, racetype, driver_code, laps, position=False):
+    # Serves laps from the per-lap cache and extracts only the missing ones, with one store read per call
+    laps = _timed_laps(laps)
+    if laps['LapNumber'].isna().any():
+        laps = laps[laps['LapNumber'].notna()]
+    if laps.empty:
+        return pd.DataFrame()
+    cache = get_lap_cache()
+    session = session_store.session_key(year, circuit, racetype)
+    lap_numbers = laps['LapNumber'].astype(int).tolist()
+
+    frames = {}
+    for lap_number in lap_numbers:
+        frame = cache.get((session, driver_code, lap_number))
+        # A car-only entry is upgraded in place the first time a merged view needs that lap
+        if frame is not None and (not position or 'X' in frame.columns):
+            frames[lap_number] = frame
+    record_cache('lap_telemetry', hits=len(frames), misses=len(lap_numbers) - len(frames))
+
+    missing = laps if not frames else laps[[lap_number not in frames for lap_number in lap_numbers]]
+    if not missing.empty:
+        telemetry = extract_laps_telemetry(load_driver_car_data(year, circuit, racetype, driver_code, missing), missing)
+        if position:
+            telemetry = attach_position(telemetry, load_driver_pos_data(year, circuit, racetype, driver_code, missing))
+        if not telemetry.empty:
+            numbers = telemetry['LapNumber'].to_numpy()
+            bounds = np.concatenate(([0], np.flatnonzero(numbers[1:] != numbers[:-1]) + 1, [len(numbers)]))
+            row_bytes = telemetry.memory_usage(index=False, deep=False).sum() / len(telemetry)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                frame = telemetry.iloc[start:end].reset_index(drop=True)
+                frames[int(numbers[start])] = frame
+                cache.put((session, driver_code, int(numbers[start])), frame, int(row_bytes * (end - start)))
+
+    ordered = [frames[lap_number] for lap_number in lap_numbers if lap_number in frames]
+    if not ordered:
+        return pd.DataFrame()
+    telemetry = ordered[0] if len(ordered) == 1 else pd.concat(ordered, ignore_index=True)
+    if not position and 'X' in telemetry.columns:
+        telemetry = telemetry.drop(columns=['X', 'Y', 'Z'])
+    if telemetry['Compound'].dtype != 'category':
+        telemetry['Compound'] = telemetry['Compound'].astype('category')
+    return telemetry
+
+def load_driver_telemetry(year, circuit, racetype, all_laps, driver_code):
+    # Quick-lap telemetry for one driver, the same laps as get_driver_telemetry
+    driver_laps = all_laps.pick_drivers(driver_code).pick_quicklaps()
+    if driver_laps.empty:
         return pd.DataFrame()
-    return pd.concat(all_telemetry)
\ No newline at end of file
+    return load_laps_telemetry(year, circuit, racetype, driver_code, driver_laps)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import joblib
+import numpy as np
+import pandas as pd
+from model_registry import MODELS_DIR, MODEL_SUFFIX, safe_model_name
+from training_data import DATASET_DIR, TARGET, load_circuit, load_dataset_manifest, partition_hash
+
+TRAINING_DATA = DATASET_DIR  # or the notebook's one-hot TrainingDataF1.csv
+LEDGER_FILE = os.path.join(MODELS_DIR, "training_ledger.json")
+MIN_CIRCUIT_ROWS = 500
+
+
+# ----------- LEDGER -----------
+def load_ledger(path=LEDGER_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_ledger(ledger, path=LEDGER_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(ledger, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# ----------- TRAINING -----------
+def load_training_data(path):
+    # The legacy CSV: every circuit is parsed to train any one of them
+    full_df = pd.read_csv(path)
+    if 'Unnamed: 0' in full_df.columns:
+        full_df = full_df.drop(columns=['Unnamed: 0'])
+
+    bool_cols = full_df.select_dtypes(include='bool').columns
+    full_df[bool_cols] = full_df[bool_cols].astype(int)
+    return full_df
+
+def partition_by_circuit(full_df):
+    return {circuit: circuit_df.drop(columns=['EventName'])
+            for circuit, circuit_df in full_df.groupby('EventName', sort=True)}
+
+def train_and_evaluate_circuit(circuit_name, circuit_df, threads=1, models_dir=MODELS_DIR):
+    # Heavy imports stay inside the worker so the parent process stays light
+    import lightgbm as lgb
+    import xgboost as xgb
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+    from model_export import TOLERANCE, check_model, export_model, validation_matrix
+    from tree_scorer import COMPILED_SUFFIX, CompiledModel
+
+    start = time.perf_counter()
+    y = circuit_df[TARGET]
+    X = circuit_df.drop(columns=[TARGET])
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    models = {
+        'XGBoost': xgb.XGBRegressor(random_state=42, n_jobs=threads),
+        'LightGBM': lgb.LGBMRegressor(random_state=42, n_jobs=threads, verbose=-1)
+    }
+
+    circuit_results = {'Circuit': circuit_name, 'Rows': len(circuit_df)}
+    trained_models = {}
+    for name, model in models.items():
+        model_start = time.perf_counter()
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+
+        circuit_results[f'{name}_RMSE'] = float(np.sqrt(mean_squared_error(y_test, y_pred)))
+        circuit_results[f'{name}_R2'] = float(r2_score(y_test, y_pred))
+        circuit_results[f'{name}_Seconds'] = round(time.perf_counter() - model_start, 2)
+        trained_models[name] = model
+
+    best_model_name = 'XGBoost' if circuit_results['XGBoost_RMSE'] <= circuit_results['LightGBM_RMSE'] else 'LightGBM'
+    best_model = trained_models[best_model_name]
+
+    safe_filename = safe_model_name(circuit_name)
+    model_filename = os.path.join(models_dir, f"{safe_filename}{MODEL_SUFFIX}")
+    joblib.dump(best_model, model_filename)
+
+    # Keep the predictor's compiled copy in sync with the new pickle; the registry prefers the compiled
+    # copy, so one that disagrees with the model is removed rather than left stale
+    compiled_dir = os.path.join(models_dir, "compiled")
+    os.makedirs(compiled_dir, exist_ok=True)
+    compiled_path = os.path.join(compiled_dir, f"{safe_filename}{COMPILED_SUFFIX}")
+    arrays = export_model(best_model)
+    compiled_error = check_model(best_model, CompiledModel(arrays), validation_matrix(arrays))
+    if compiled_error <= TOLERANCE:
+        np.savez_compressed(compiled_path, **arrays)
+    elif os.path.exists(compiled_path):
+        os.remove(compiled_path)
+
+    circuit_results.update({
+        'Best_Model': best_model_name,
+        'Model_Path': model_filename,
+        'Model_Bytes': os.path.getsize(model_filename),
+        'Compiled': compiled_error <= TOLERANCE,
+        'Compiled_Max_Error': compiled_error,
+        'Train_Seconds': round(time.perf_counter() - start, 2)
+    })
+    return circuit_results
+
+def train_circuit_partition(circuit_name, dataset_dir, threads=1, models_dir=MODELS_DIR):
+    # Runs in a worker: reads only this circuit's partition of the Parquet dataset
+    return train_and_evaluate_circuit(circuit_name, load_circuit(circuit_name, dataset_dir), threads, models_dir)
+
+def train_all(data=TRAINING_DATA, workers=None, threads=None, force=False, models_dir=MODELS_DIR,
+              ledger_path=LEDGER_FILE, circuits=None):
+    # data is a Parquet dataset directory or an already loaded one-hot frame
+    os.makedirs(models_dir, exist_ok=True)
+    workers = workers or max(1, (os.cpu_count() or 1) // 2)
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+
+    ledger = load_ledger(ledger_path)
+    if isinstance(data, pd.DataFrame):
+        partitions = partition_by_circuit(data)
+        plan = {circuit: (len(circuit_df), partition_hash(circuit_df)) for circuit, circuit_df in partitions.items()}
+        submit = lambda pool, circuit: pool.submit(train_and_evaluate_circuit, circuit, partitions[circuit],
+                                                   threads, models_dir)
+    else:
+        # Rows and hashes come from the dataset manifest, so unchanged circuits are never read
+        plan = {circuit: (partition['rows'], partition['hash'])
+                for circuit, partition in load_dataset_manifest(data)['partitions'].items()}
+        submit = lambda pool, circuit: pool.submit(train_circuit_partition, circuit, data, threads, models_dir)
+    if circuits:
+        missing = sorted(set(circuits) - set(plan))
+        if missing:
+            print(f"❌ Not in the training data: {', '.join(missing)}")
+        plan = {circuit: plan[circuit] for circuit in plan if circuit in circuits}
+
+    jobs = {}
+    for circuit, (rows, data_hash) in plan.items():
+        entry = ledger.get(circuit, {})
+        model_path = os.path.join(models_dir, f"{safe_model_name(circuit)}{MODEL_SUFFIX}")
+        if rows < MIN_CIRCUIT_ROWS:
+            print(f"Skipping {circuit}, not enough data ({rows} rows).")
+            continue
+        if not force and entry.get('Data_Hash') == data_hash and os.path.exists(model_path):
+            continue
+        jobs[circuit] = data_hash
+
+    print(f"{len(jobs)} of {len(plan)} circuits need training "
+          f"({workers} workers x {threads} threads)")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {submit(pool, circuit): circuit for circuit in jobs}
+        for future in as_completed(futures):
+            circuit = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {circuit}: {type(e).__name__}: {e}")
+                continue
+
+            result.update({'Data_Hash': jobs[circuit], 'Trained_At': time.strftime("%Y-%m-%dT%H:%M:%S")})
+            ledger[circuit] = result
+            save_ledger(ledger, ledger_path)
+            print(f"✅ {circuit}: {result['Best_Model']} "
+                  f"(RMSE: {result[result['Best_Model'] + '_RMSE']:.3f}, {result['Train_Seconds']}s)")
+            if not result['Compiled']:
+                print(f"❌ {circuit}: compiled copy off by {result['Compiled_Max_Error']:.2e}s, serving the joblib model")
+    return ledger
+
+def summarize_ledger(ledger):
+    results_df = pd.DataFrame(ledger.values())
+    if results_df.empty:
+        return {'total_models_trained': 0}
+    best_rmse = results_df.apply(lambda row: row[f"{row['Best_Model']}_RMSE"], axis=1)
+    best_r2 = results_df.apply(lambda row: row[f"{row['Best_Model']}_R2"], axis=1)
+    return {
+        "total_models_trained": len(results_df),
+        "average_rmse": best_rmse.mean(),
+        "average_r2": best_r2.mean(),
+        "total_train_seconds": results_df['Train_Seconds'].sum()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-circuit lap time models, retraining only changed circuits.")
+    parser.add_argument("--data", default=TRAINING_DATA,
+                        help="Dataset directory from training_data.py, or a one-hot training CSV")
+    parser.add_argument("--circuits", nargs="+", default=None, help="Only train these EventNames")
+    parser.add_argument("--workers", type=int, default=None, help="Circuits trained in parallel")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per model (default: CPUs / workers)")
+    parser.add_argument("--force", action="store_true", help="Retrain every circuit regardless of the ledger")
+    args = parser.parse_args()
+
+    data = load_training_data(args.data) if args.data.endswith(".csv") else args.data
+    ledger = train_all(data, args.workers, args.threads, args.force, circuits=args.circuits)
+    print("\n--- Final Model Performance Summary ---")
+    print(summarize_ledger(ledger))
@@ -0,0 +1,221 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from weather_features import WEATHER_FEATURES
+
+DATASET_DIR = "./data/training"
+MANIFEST_FILE = "_dataset.json"  # names the current build directory; replacing it switches readers over
+BUILD_PREFIX = "build-"
+PARTITION_COLUMNS = ['EventName', 'Year']
+TARGET = 'LapTime(s)'
+# Numeric model inputs in the column order the notebook's TrainingDataF1.csv had
+FEATURE_COLUMNS = ['LapNumber', 'Stint', 'TyreLife'] + WEATHER_FEATURES + ['Year']
+CATEGORY_COLUMNS = ['Driver', 'Compound']
+IMPUTE_KEYS = ['Driver', 'EventName']  # gaps are filled from the same driver at the same circuit, across years
+COLUMN_DTYPES = {
+    'Driver': 'category',
+    'Compound': 'category',
+    'LapNumber': 'float32',
+    'Stint': 'float32',
+    'TyreLife': 'float32',
+    **{column: 'float32' for column in WEATHER_FEATURES},
+    'Rainfall': 'int8',
+    TARGET: 'float32'
+}
+
+
+# ----------- IMPUTATION -----------
+def _group_codes(df, keys):
+    # Row -> group number, the join key for broadcasting per-group values back; -1 where a key is null
+    grouped = df.groupby(keys, sort=False, observed=True)
+    return grouped, grouped.ngroup().fillna(-1).to_numpy(dtype='int64')
+
+def _broadcast(values, codes, fill):
+    return np.where(codes >= 0, values[np.maximum(codes, 0)], fill)
+
+def fill_group_median(df, column, keys, codes=None):
+    # One built-in groupby median, broadcast to the rows; groups with no values stay null
+    grouped, group_codes = _group_codes(df, keys) if codes is None else codes
+    medians = grouped[column].median().to_numpy(dtype='float64')
+    return df[column].fillna(pd.Series(_broadcast(medians, group_codes, np.nan), index=df.index))
+
+def fill_group_mode(df, column, keys, codes=None):
+    # Value counts per group; ties go to the smallest value, as Series.mode()[0] did
+    grouped, group_codes = _group_codes(df, keys) if codes is None else codes
+    value_codes, values = pd.factorize(df[column], sort=True)
+    present = (group_codes >= 0) & (value_codes >= 0)
+    counts = pd.DataFrame({'group': group_codes[present], 'value': value_codes[present]}) \
+        .groupby(['group', 'value'], sort=True).size()
+    counts = counts.sort_values(ascending=False, kind='stable')
+    top = counts[~counts.index.get_level_values('group').duplicated()]
+
+    modes = np.full(grouped.ngroups, None, dtype=object)
+    modes[top.index.get_level_values('group')] = np.asarray(values, dtype=object)[top.index.get_level_values('value')]
+    # Only the null rows are written; the factorized codes already say which they are
+    missing = np.flatnonzero(value_codes < 0)
+    filled = df[column].copy()
+    filled.iloc[missing] = _broadcast(modes, group_codes[missing], None)
+    return filled
+
+def impute_groups(df, keys, median_columns=(), mode_columns=()):
+    # Fills in place; the group codes are computed once and shared by every column
+    codes = _group_codes(df, keys)
+    for column in median_columns:
+        df[column] = fill_group_median(df, column, keys, codes)
+    for column in mode_columns:
+        df[column] = fill_group_mode(df, column, keys, codes)
+    return df
+
+
+# ----------- PREPROCESSING -----------
+def preprocess_laps(laps):
+    # The notebook's cleaning, minus the one-hot expansion: that happens per circuit at load time
+    df = laps.copy()
+    lap_time = df['LapTime']
+    if not pd.api.types.is_timedelta64_dtype(lap_time):
+        lap_time = pd.to_timedelta(lap_time)  # only the CSV stores timedeltas as strings
+    df[TARGET] = lap_time.dt.total_seconds()
+
+    impute_groups(df, IMPUTE_KEYS, median_columns=['TyreLife', 'Stint'], mode_columns=['Compound'])
+    df['Rainfall'] = df['Rainfall'].fillna(False).astype(bool)
+
+    frame = df[PARTITION_COLUMNS + list(COLUMN_DTYPES)].astype(COLUMN_DTYPES)
+    frame['EventName'] = frame['EventName'].astype(str)
+    frame['Year'] = frame['Year'].astype('int16')
+    # Sorted categories, so the one-hot columns come out in the same order as pd.get_dummies gave
+    for column in CATEGORY_COLUMNS:
+        frame[column] = frame[column].cat.reorder_categories(sorted(frame[column].cat.categories))
+    return frame
+
+def partition_hash(circuit_df):
+    # Content hash of the partition, independent of row order and the index
+    columns = sorted(circuit_df.columns)
+    row_hashes = np.sort(pd.util.hash_pandas_object(circuit_df[columns], index=False).to_numpy())
+    digest = hashlib.sha256(",".join(columns).encode())
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+# ----------- MANIFEST -----------
+def load_dataset_manifest(dataset_dir=DATASET_DIR):
+    path = os.path.join(dataset_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No training dataset in {dataset_dir}, run training_data.py first")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_dataset_manifest(manifest, dataset_dir):
+    path = os.path.join(dataset_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _build_dirs(dataset_dir):
+    return sorted(name for name in os.listdir(dataset_dir)
+                  if name.startswith(BUILD_PREFIX) and os.path.isdir(os.path.join(dataset_dir, name)))
+
+def dataset_bytes(dataset_dir=DATASET_DIR):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(dataset_dir) for name in names if name.endswith(".parquet"))
+
+
+# ----------- WRITE -----------
+def write_training_dataset(frame, dataset_dir=DATASET_DIR, source=None):
+    # Each build gets its own directory and the manifest is replaced last, so a reader always finds
+    # a complete build; the previous one is kept for readers that loaded the old manifest
+    start = time.perf_counter()
+    try:
+        previous = load_dataset_manifest(dataset_dir).get('build')
+    except FileNotFoundError:
+        previous = None
+    build = f"{BUILD_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 10**9:09d}"
+    build_dir = os.path.join(dataset_dir, build)
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ds.write_dataset(
+        table, build_dir, format="parquet",
+        partitioning=PARTITION_COLUMNS, partitioning_flavor="hive",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        basename_template="part-{i}.parquet"
+    )
+
+    partitions = {}
+    for event, event_df in frame.groupby('EventName', sort=True):
+        partitions[event] = {'rows': len(event_df),
+                             'years': sorted(int(year) for year in event_df['Year'].unique()),
+                             'hash': partition_hash(event_df.drop(columns=['EventName']))}
+    manifest = {
+        'build': build,
+        'source': source,
+        'rows': len(frame),
+        'columns': {column: str(dtype) for column, dtype in frame.dtypes.items()},
+        'categories': {column: list(frame[column].cat.categories) for column in CATEGORY_COLUMNS},
+        'partitions': partitions,
+        'bytes': dataset_bytes(build_dir),
+        'built_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+    _write_dataset_manifest(manifest, dataset_dir)
+
+    for name in _build_dirs(dataset_dir):
+        if name not in (build, previous):
+            shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+    return manifest
+
+def build_training_dataset(shards_dir=None, csv_path=None, dataset_dir=DATASET_DIR):
+    if csv_path:
+        laps = pd.read_csv(csv_path)
+        source = csv_path
+    else:
+        from dataset_builder import SHARDS_DIR, load_dataset
+        shards_dir = shards_dir or SHARDS_DIR
+        laps = load_dataset(shards_dir)
+        source = shards_dir
+    if laps.empty:
+        raise ValueError(f"No laps found in {source}")
+    return write_training_dataset(preprocess_laps(laps), dataset_dir, source)
+
+
+# ----------- READ -----------
+def load_partition(event_name, dataset_dir=DATASET_DIR, years=None, manifest=None):
+    # Only the EventName=<event_name> directory is opened; the other circuits are never read
+    manifest = manifest or load_dataset_manifest(dataset_dir)
+    condition = ds.field('EventName') == event_name
+    if years:
+        condition &= ds.field('Year').isin(list(years))
+    dataset = ds.dataset(os.path.join(dataset_dir, manifest.get('build', '')), format="parquet", partitioning="hive")
+    table = dataset.to_table(filter=condition, columns=['Year'] + list(COLUMN_DTYPES))
+
+    frame = table.to_pandas()
+    frame['Year'] = frame['Year'].astype('int16')
+    for column, categories in manifest['categories'].items():
+        frame[column] = pd.Categorical(frame[column], categories=categories)
+    return frame
+
+def to_model_frame(frame):
+    # One-hot columns for every known driver and compound, as the per-circuit models were trained on
+    dummies = [pd.get_dummies(frame[column], prefix=column, dtype='uint8') for column in CATEGORY_COLUMNS]
+    return pd.concat([frame[FEATURE_COLUMNS + [TARGET]]] + dummies, axis=1)
+
+def load_circuit(event_name, dataset_dir=DATASET_DIR, years=None):
+    return to_model_frame(load_partition(event_name, dataset_dir, years))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the typed training dataset, partitioned by EventName and Year.")
+    parser.add_argument("--shards", default=None, help="dataset_builder.py shards directory (default: ./data/shards)")
+    parser.add_argument("--csv", default=None, help="Build from a raw lap CSV such as Formula_1_Data_2018-24.csv instead")
+    parser.add_argument("--out", default=DATASET_DIR, help="Output dataset directory")
+    args = parser.parse_args()
+
+    dataset_manifest = build_training_dataset(args.shards, args.csv, args.out)
+    print(f"✅ {dataset_manifest['rows']} laps, {len(dataset_manifest['partitions'])} circuits, "
+          f"{dataset_manifest['bytes'] / 1024 / 1024:.1f} MB in {args.out} ({dataset_manifest['seconds']}s)")
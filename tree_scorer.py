@@ -0,0 +1,82 @@
+import numpy as np
+
+# Missing-value handling per split, mirroring LightGBM's MissingType
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+
+COMPILED_SUFFIX = "_model.npz"
+
+
+class CompiledModel:
+    # Flattened tree ensemble scored with NumPy only; no xgboost/lightgbm import needed
+    def __init__(self, arrays):
+        self.kind = str(arrays['kind'])
+        self.features = [str(f) for f in arrays['features']]
+        self.base_score = float(arrays['base_score'])
+        self.roots = arrays['roots'].astype(np.int64)
+        self.feature = arrays['feature'].astype(np.int64)
+        self.left = arrays['left'].astype(np.int64)
+        self.right = arrays['right'].astype(np.int64)
+        self.default_left = arrays['default_left'].astype(bool)
+        self.missing_type = arrays['missing_type'].astype(np.int8)
+        self.value = arrays['value'].astype(np.float64)
+        if self.kind == 'xgboost':
+            # XGBoost compares features and thresholds in float32
+            self.threshold = arrays['threshold'].astype(np.float32)
+        else:
+            self.threshold = arrays['threshold'].astype(np.float64)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.roots, self.feature, self.threshold, self.left, self.right,
+                                      self.default_left, self.missing_type, self.value))
+
+    def predict(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features].to_numpy(dtype=np.float64)
+        X = np.asarray(X, dtype=np.float32 if self.kind == 'xgboost' else np.float64)
+        if self.kind == 'lightgbm' and not (self.missing_type == MISSING_NAN).any():
+            # Without NaN-aware splits LightGBM treats every NaN as zero
+            X = np.nan_to_num(X, nan=0.0)
+        needs_missing = np.isnan(X).any() or (self.missing_type == MISSING_ZERO).any()
+
+        # Feature-major copy so each split gathers from one contiguous column
+        columns = np.ascontiguousarray(X.T)
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)
+        prediction = np.full(n_rows, self.base_score)
+        for root in self.roots:
+            nodes = np.full(n_rows, root)
+            active = rows if self.feature[root] >= 0 else rows[:0]
+            while active.size:
+                current = nodes[active]
+                values = columns[self.feature[current], active]
+                if needs_missing:
+                    go_left = self._go_left(values, current)
+                elif self.kind == 'xgboost':
+                    go_left = values < self.threshold[current]
+                else:
+                    go_left = values <= self.threshold[current]
+                current = np.where(go_left, self.left[current], self.right[current])
+                nodes[active] = current
+                active = active[self.feature[current] >= 0]
+            prediction += self.value[nodes]
+        return prediction
+
+    def _go_left(self, values, nodes):
+        threshold = self.threshold[nodes]
+        missing = np.isnan(values)
+        if self.kind == 'xgboost':
+            return np.where(missing, self.default_left[nodes], values < threshold)
+
+        missing_type = self.missing_type[nodes]
+        values = np.where(missing & (missing_type != MISSING_NAN), 0.0, values)
+        use_default = ((missing_type == MISSING_ZERO) & (np.abs(values) <= 1e-35)) | \
+                      ((missing_type == MISSING_NAN) & missing)
+        return np.where(use_default, self.default_left[nodes], values <= threshold)
+
+
+def load_compiled_model(path):
+    with np.load(path, allow_pickle=False) as arrays:
+        return CompiledModel(arrays)
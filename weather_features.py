@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+WEATHER_FEATURES = ['AirTemp', 'Humidity', 'Pressure', 'Rainfall', 'TrackTemp', 'WindDirection', 'WindSpeed']
+# Each scenario adjusts the session's averages: (scale, offset) per feature, or a fixed value
+SCENARIO_ADJUSTMENTS = {
+    "Use Historical Average": {},
+    "Simulate: Sunny & Hot": {'AirTemp': (1, 5), 'Humidity': (1, -5), 'Rainfall': 0,
+                              'TrackTemp': (1, 5), 'WindSpeed': (1, -2)},
+    "Simulate: Cloudy & Cool": {'AirTemp': (1, -3), 'Humidity': (1, 10), 'Rainfall': 0,
+                                'TrackTemp': (1, -5), 'WindSpeed': (1.5, 0)},
+    "Simulate: Light Rain": {'AirTemp': (1, -10), 'Humidity': 98.0, 'Rainfall': 1,
+                             'TrackTemp': (1, -15), 'WindSpeed': (1.5, 0)}
+}
+WEATHER_SCENARIOS = list(SCENARIO_ADJUSTMENTS)
+WEATHER_CACHE_ENTRIES = 64
+
+
+class WeatherIndex:
+    # One session's weather, sorted by time once, with its averages and every scenario's conditions precomputed
+    def __init__(self, weather_data):
+        columns = [feature for feature in WEATHER_FEATURES if feature in weather_data.columns]
+        # Averages, except Rainfall: the most common state over the session, ties going to dry
+        averages = weather_data[[c for c in columns if c != 'Rainfall']].astype('float64').mean()
+        rainfall = weather_data['Rainfall'].dropna().astype('float64').mode() if 'Rainfall' in columns else []
+        averages['Rainfall'] = rainfall.iloc[0] if len(rainfall) else np.nan
+        self.averages = averages.reindex(WEATHER_FEATURES).to_numpy(dtype=np.float64)
+
+        self.scenarios = np.tile(self.averages, (len(WEATHER_SCENARIOS), 1))
+        for row, adjustments in enumerate(SCENARIO_ADJUSTMENTS.values()):
+            for feature, adjustment in adjustments.items():
+                column = WEATHER_FEATURES.index(feature)
+                if isinstance(adjustment, tuple):
+                    scale, offset = adjustment
+                    self.scenarios[row, column] = self.averages[column] * scale + offset
+                else:
+                    self.scenarios[row, column] = adjustment
+
+        self.times = None
+        self.frame = weather_data[columns].reset_index(drop=True)
+        if 'Time' in weather_data.columns:
+            weather = weather_data[['Time'] + columns]
+            self.frame = weather[weather['Time'].notna()].sort_values('Time', kind='stable').reset_index(drop=True)
+            self.times = self.frame['Time'].to_numpy()
+
+    def scenario_matrix(self, scenarios):
+        # One row of WEATHER_FEATURES per scenario; unknown scenarios get the historical average
+        rows = [WEATHER_SCENARIOS.index(s) if s in SCENARIO_ADJUSTMENTS else 0 for s in scenarios]
+        return self.scenarios[rows]
+
+    def conditions(self, scenario):
+        return dict(zip(WEATHER_FEATURES, self.scenario_matrix([scenario])[0].tolist()))
+
+    def attach(self, laps, on='Time'):
+        # The latest weather sample at or before each lap's time (merge_asof backward), in the laps' own order
+        if self.times is None:
+            raise KeyError("Weather data has no 'Time' column to join on")
+        lap_times = laps[on].to_numpy()
+        positions = np.searchsorted(self.times, lap_times, side='right') - 1
+        matched = (positions >= 0) & ~pd.isna(lap_times)
+        # -1 is not a row label, so unmatched laps come back as nulls, as merge_asof leaves them
+        weather = self.frame.drop(columns=['Time']).reindex(np.where(matched, positions, -1))
+        weather.index = laps.index
+        return pd.concat([laps.drop(columns=weather.columns, errors='ignore'), weather], axis=1)
+
+
+def weather_fingerprint(weather_data):
+    digest = hashlib.sha1(",".join(map(str, weather_data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(weather_data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class WeatherIndexCache:
+    # LRU of indexes keyed by the weather's content, so reruns, sweeps and live refreshes of a session share one
+    def __init__(self, max_entries=WEATHER_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+
+    def get(self, weather_data):
+        key = weather_fingerprint(weather_data)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index, True
+            self.misses += 1
+        index = WeatherIndex(weather_data)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index, False
+
+    def cache_info(self):
+        with self._lock:
+            return {'sessions': len(self._indexes), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+# Module-level rather than st.cache_resource: dataset_builder's workers use this module without Streamlit
+_weather_cache = WeatherIndexCache()
+
+def get_weather_cache():
+    return _weather_cache
+
+def get_weather_index(weather_data):
+    from instrumentation import record_cache
+    index, hit = _weather_cache.get(weather_data)
+    record_cache('weather', hits=hit, misses=not hit)
+    return index